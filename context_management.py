@@ -1,10 +1,105 @@
 # Importing necessary types and functions
-from typing import List, Optional
-from model import chat
+import os
+import difflib
+import hashlib
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from model import chat, achat
+
+# Tokens of the model's context window, the fraction of it the context may
+# fill before it is summarized, and how many recent messages stay verbatim
+CONTEXT_WINDOW_ENV = "HILBERT_CONTEXT_WINDOW"
+SUMMARIZE_AT_ENV = "HILBERT_SUMMARIZE_AT"
+KEEP_LAST_ENV = "HILBERT_KEEP_LAST_MESSAGES"
+
+context_window: int = int(os.environ.get(CONTEXT_WINDOW_ENV) or 131072)
+summarize_at: float = float(os.environ.get(SUMMARIZE_AT_ENV) or 0.5)
+keep_last: int = int(os.environ.get(KEEP_LAST_ENV) or 4)
+# Size a summary level may reach before it is condensed into the level above
+SUMMARY_TOKENS_ENV = "HILBERT_SUMMARY_TOKENS"
+summary_max_tokens: int = int(os.environ.get(SUMMARY_TOKENS_ENV) or 1024)
+# Older levels are coarser; the top one is condensed in place
+MAX_SUMMARY_LEVELS = 3
 
 # Initialize the arrays to store chat history and context
 chat_his: List[str] = []
 context: List[dict] = []
+# Token count of each message in context, and their sum
+context_tokens: List[int] = []
+context_total: int = 0
+# Running summary of the messages evicted from context, most recent level
+# first, and how many messages at the start of context stand for it
+summary_levels: List[str] = []
+summary_count: int = 0
+
+class SeenFile(NamedTuple):
+    """The version of a file the model last had sent to it"""
+    digest: str
+    content: str
+    # Turn it was sent in, and the turn of the full copy a diff builds on
+    turn: int
+    base_turn: int
+
+# Turns in which file contents were sent, the turn each message in context
+# was appended in, and the files the model has in its context
+file_turn: int = 0
+context_turns: List[int] = []
+seen_files: Dict[str, SeenFile] = {}
+# Notes and diffs sent in place of a file, by turn: (path, note, file
+# content, turn of the full copy it refers back to)
+file_notes: Dict[int, List[Tuple[str, str, str, int]]] = {}
+
+def approximate_tokens(text: str) -> int:
+    """Fast token estimate of about four characters per token"""
+    return len(text) // 4 + 1
+
+tokenizer: Callable[[str], int] = approximate_tokens
+
+def set_tokenizer(count_tokens: Callable[[str], int]) -> None:
+    """
+    Count tokens with `count_tokens` from now on, e.g. a real tokenizer's
+    `lambda text: len(encoding.encode(text))`
+    """
+    global tokenizer
+    tokenizer = count_tokens
+    _recount()
+
+def configure(window: Optional[int] = None, fraction: Optional[float] = None, keep: Optional[int] = None,
+              summary_tokens: Optional[int] = None) -> None:
+    """
+    Change the context window, the summarization threshold, the messages kept
+    verbatim or the size of a summary level
+    """
+    global context_window, summarize_at, keep_last, summary_max_tokens
+    if window is not None:
+        context_window = window
+    if fraction is not None:
+        summarize_at = fraction
+    if keep is not None:
+        keep_last = keep
+    if summary_tokens is not None:
+        summary_max_tokens = summary_tokens
+
+def _message_tokens(message: dict) -> int:
+    # A few tokens of per-message overhead for the role and separators
+    return tokenizer(message["content"]) + 4
+
+def _recount() -> None:
+    global context_tokens, context_total, context_turns
+    context_tokens = [_message_tokens(message) for message in context]
+    context_total = sum(context_tokens)
+    # Unknown, so treated as recent: evicting any of them forgets every file
+    context_turns = [file_turn] * len(context)
+
+def context_token_count() -> int:
+    """Tokens in the current context"""
+    if len(context_tokens) != len(context):
+        # The list was changed directly instead of through append_context
+        _recount()
+    return context_total
+
+def needs_summary() -> bool:
+    """Whether the context has reached the summarization threshold"""
+    return context_token_count() >= context_window * summarize_at and len(context) > keep_last
 
 def append_chat_history(prompt: str) -> None:
     """
@@ -22,25 +117,18 @@ def append_chat_history(prompt: str) -> None:
     # Append the prompt to the chat history
     chat_his.append(prompt)
 
-def summarize(context_list: List[dict]) -> str:
+def summary_conversation(context_list: List[dict], previous_summary: Optional[str] = None) -> List[dict]:
     """
-    Use LLM to summarize the given context list into a single string
-    
-    Args:
-        context_list (List[dict]): List of context dictionaries to summarize
-        
-    Returns:
-        str: Summarized context
+    Messages asking the summarizer model to summarize `context_list`, or to
+    fold it into `previous_summary` when there is one
     """
-    # Debug: Print chat history
-    print("\n=== Debug: Chat History ===")
-    print(f"Number of context items: {len(context_list)}")
-    for idx, message in enumerate(context_list):
-        print(f"Message {idx + 1}:")
-        print(f"Role: {message['role']}")
-        print(f"Content: {message['content']}\n")
+    transcript = "\n".join([f"{message['role']}: {message['content']}" for message in context_list])
+    if previous_summary:
+        transcript = f"""Summary of the conversation so far:
+{previous_summary}
 
-    # Prepare the conversation for the model
+Rewrite that summary so that it also covers these newer messages:
+{transcript}"""
     conversation = [
         {
             "role": "system",
@@ -61,32 +149,150 @@ def summarize(context_list: List[dict]) -> str:
         },
         {
             "role": "user",
-            "content": "\n".join([f"{message['role']}: {message['content']}" for message in context_list])
+            "content": transcript
         }
     ]
+    return conversation
+
+def _fallback_summary(context_list: List[dict], previous_summary: Optional[str]) -> str:
+    # Plain text, cut to the summary budget so that the next fold stays bounded
+    text = "\n".join(([previous_summary] if previous_summary else []) + [message['content'] for message in context_list])
+    return text[-summary_max_tokens * 4:]
+
+def summarize(context_list: List[dict], previous_summary: Optional[str] = None) -> str:
+    """
+    Use LLM to summarize the given context list into a single string
     
-    # Debug: Print model payload
-    print("\n=== Debug: Model Payload ===")
-    print("System prompt:", conversation[0]['content'])
-    print("\nFormatted context for model:", conversation[1]['content'])
-    
+    Args:
+        context_list (List[dict]): List of context dictionaries to summarize
+        previous_summary (Optional[str]): Summary of earlier messages to fold them into
+        
+    Returns:
+        str: Summarized context
+    """
+    conversation = summary_conversation(context_list, previous_summary)
     try:
         # Call the model using the chat function from model.py
-        summary = chat("You are a summarizer",conversation, "llama-3.1-8b-instant")
-        print(f"\n=== Debug: Model Response {summary} ===")
-        return summary
+        return chat("You are a summarizer",conversation, "llama-3.1-8b-instant")
     except Exception as e:
         # If summarization fails, fall back to simple concatenation
         print(f"Warning: Summarization failed - {str(e)}")
-        return "\n".join([message['content'] for message in context_list])
+        return _fallback_summary(context_list, previous_summary)
 
-def append_context(role: str, content: str, summarize_bool: Optional[bool]) -> None:
+async def asummarize(context_list: List[dict], previous_summary: Optional[str] = None) -> str:
+    """Async version of summarize()"""
+    conversation = summary_conversation(context_list, previous_summary)
+    try:
+        return await achat("You are a summarizer", conversation, "llama-3.1-8b-instant")
+    except Exception as e:
+        print(f"Warning: Summarization failed - {str(e)}")
+        return _fallback_summary(context_list, previous_summary)
+
+def _summary_input(levels: List[str], level: int):
+    """
+    What condensing `level` sends to summarize(): the level as the new
+    material and the level above as the summary so far. The top level is
+    condensed on its own.
+    """
+    higher = levels[level + 1] if level + 1 < len(levels) else None
+    return [{"role": "summary", "content": levels[level]}], higher
+
+def _fold_result(levels: List[str], level: int, merged: str) -> List[str]:
+    levels = list(levels)
+    if level + 1 < MAX_SUMMARY_LEVELS:
+        levels[level:level + 2] = ["", merged]
+    else:
+        levels[level] = merged
+    return levels
+
+def _oversized(levels: List[str], level: int) -> bool:
+    return bool(levels[level]) and tokenizer(levels[level]) > summary_max_tokens
+
+def _summary_messages(levels: List[str]) -> List[dict]:
+    """The messages that stand for the summarized part of the conversation"""
+    parts = [text for text in reversed(levels) if text]
+    if not parts:
+        return []
+    return [
+        {"role": "user", "content": "Above is the summarized context: " + "\n\nMore recently: ".join(parts)},
+        {"role": "assistant", "content": "Understood I will continue the conversation."},
+    ]
+
+def _replace_with_summary(count: int, levels: List[str]) -> None:
+    """Replace the first `count` messages of the context with the new summary levels"""
+    global context, context_tokens, context_total, context_turns, summary_levels, summary_count
+    context_token_count()
+    summary = _summary_messages(levels)
+    evicted_turn = max(context_turns[:count], default=-1)
+    _forget_files(evicted_turn)
+    kept = _restore_files(context[count:], context_turns[count:], evicted_turn)
+    context_tokens = [_message_tokens(message) for message in summary] + [
+        tokens if message is old else _message_tokens(message)
+        for message, old, tokens in zip(kept, context[count:], context_tokens[count:])
+    ]
+    context = summary + kept
+    context_turns = [file_turn] * len(summary) + context_turns[count:]
+    context_total = sum(context_tokens)
+    summary_levels = levels
+    summary_count = len(summary)
+
+def _eviction_count(keep: Optional[int]) -> int:
+    """How many messages at the start of the context a compaction replaces"""
+    return len(context) - (keep_last if keep is None else keep)
+
+def compact_context_now(keep: Optional[int] = None) -> None:
+    """
+    Fold all but the last `keep` messages of the context into the running
+    summary.
+
+    Only the messages evicted since the last compaction are sent along with
+    the current summary, never the whole session. When a summary level grows
+    past `summary_max_tokens`, it is condensed into the level above, so each
+    compaction costs a bounded number of tokens however long the session runs.
+    """
+    count = _eviction_count(keep)
+    if count <= summary_count:
+        return
+    levels = list(summary_levels) or [""]
+    levels[0] = summarize(context[summary_count:count], levels[0] or None)
+    # One pass upwards, so at most one condensation per level
+    for level in range(MAX_SUMMARY_LEVELS):
+        if level < len(levels) and _oversized(levels, level):
+            levels = _fold_result(levels, level, summarize(*_summary_input(levels, level)))
+    _replace_with_summary(count, levels)
+
+async def compact_context(keep: Optional[int] = None) -> None:
     """
-    Append a message to the context array with special handling when length reaches 5
+    Async version of compact_context_now().
+
+    Messages appended while the summary is being written are kept as they are.
+    """
+    summarized_context = context
+    count = _eviction_count(keep)
+    if count <= summary_count:
+        return
+    levels = list(summary_levels) or [""]
+    levels[0] = await asummarize(summarized_context[summary_count:count], levels[0] or None)
+    for level in range(MAX_SUMMARY_LEVELS):
+        if level < len(levels) and _oversized(levels, level):
+            levels = _fold_result(levels, level, await asummarize(*_summary_input(levels, level)))
+    if context is not summarized_context:
+        # Replaced by someone else in the meantime
+        return
+    _replace_with_summary(count, levels)
+
+def append_context(role: str, content: str, summarize_bool: Optional[bool] = None) -> None:
+    """
+    Append a message to the context array, summarizing older messages when
+    the context gets too large
     
     Args:
         role (str): The role of the message (e.g., "user", "assistant", "system")
         content (str): The content of the message
+        summarize_bool (Optional[bool]): True to summarize the existing context
+            first, False never to, None (default) to summarize once the context
+            reaches `summarize_at` of `context_window` tokens, keeping the last
+            `keep_last` messages verbatim
         
     Raises:
         TypeError: If role or content is not a string
@@ -96,7 +302,7 @@ def append_context(role: str, content: str, summarize_bool: Optional[bool]) -> N
     if not isinstance(role, str) or not isinstance(content, str):
         raise TypeError("Role and content must be strings")
     
-    global context
+    global context_total
     
     # Create message dictionary
     message = {
@@ -105,22 +311,87 @@ def append_context(role: str, content: str, summarize_bool: Optional[bool]) -> N
     }
     
     try:
-        # If boolean is true, summarize and reset
+        # If boolean is true, summarize everything so far before the new message
         if summarize_bool == True:
-            # Summarize existing context
-            summarized = summarize(context)
-            # Reset context with summarized content at index 0 and new message at index 1
-            context = [
-                {"role": "user", "content": f"Above is the summarized context: {summarized}"},
-                {"role": "assistant", "content": "Understood I will continue the conversation."},
-                message
-            ]
-        else:
-            # If boolean is false, simply append the new message
-            context.append(message)
+            compact_context_now(keep=0)
+        context_token_count()
+        context.append(message)
+        context_turns.append(file_turn)
+        context_tokens.append(_message_tokens(message))
+        context_total += context_tokens[-1]
+        if summarize_bool is None and needs_summary():
+            compact_context_now()
     except Exception as e:
         raise Exception(f"Error in context management: {str(e)}")
 
+def _forget_files(turn: int) -> None:
+    """Forget files sent up to `turn`, whose messages have been summarized away"""
+    for path in [path for path, seen in seen_files.items() if seen.base_turn <= turn]:
+        del seen_files[path]
+
+def _restore_files(messages: List[dict], turns: List[int], evicted_turn: int) -> List[dict]:
+    """
+    Put the full file back into kept messages whose note or diff refers to a
+    copy sent up to `evicted_turn`, which is about to be summarized away.
+    A note is found as its entry in the repr() of the files_for_context()
+    dict, or failing that as plain text.
+    """
+    global file_notes
+    restored = []
+    for message, turn in zip(messages, turns):
+        content = message["content"]
+        for path, note, file_content, base_turn in file_notes.get(turn, ()):
+            if base_turn > evicted_turn:
+                continue
+            entry = f"{path!r}: {note!r}"
+            if entry in content:
+                content = content.replace(entry, f"{path!r}: {file_content!r}", 1)
+            elif note in content:
+                content = content.replace(note, file_content, 1)
+        restored.append(message if content == message["content"] else {**message, "content": content})
+    file_notes = {
+        turn: [entry for entry in notes if entry[3] > evicted_turn]
+        for turn, notes in file_notes.items() if turn > evicted_turn
+    }
+    return restored
+
+def files_for_context(files: Dict[str, str]) -> Dict[str, str]:
+    """
+    What to send the model for each of `files` ({path: content}) this turn.
+
+    A file the model was already sent is replaced by a short note when it
+    hasn't changed since, or by a unified diff against the version it was
+    sent when that is shorter than the file. Anything else is sent in full.
+    Call this once per turn, right before appending the message with the
+    result, so that the files are recorded as sent in that message's turn.
+    That append must not compact the context (summarize_bool=False): a
+    compaction would summarize away the messages the notes point back to.
+    Compactions after that put the full file back in place of the note.
+    """
+    global file_turn
+    context_token_count()
+    file_turn += 1
+    sent: Dict[str, str] = {}
+    for path, content in files.items():
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        previous = seen_files.get(path)
+        if previous is not None and previous.digest == digest:
+            sent[path] = f"(unchanged since turn {previous.turn}, see above)"
+            file_notes.setdefault(file_turn, []).append((path, sent[path], content, previous.base_turn))
+            continue
+        if previous is not None:
+            diff = "".join(difflib.unified_diff(
+                previous.content.splitlines(keepends=True), content.splitlines(keepends=True),
+                fromfile=f"a/{path}", tofile=f"b/{path}"))
+            if len(diff) < len(content):
+                sent[path] = f"(changed since turn {previous.turn}, unified diff against that version)\n{diff}"
+                file_notes.setdefault(file_turn, []).append((path, sent[path], content, previous.base_turn))
+                seen_files[path] = SeenFile(digest, content, file_turn, previous.base_turn)
+                continue
+        sent[path] = content
+        seen_files[path] = SeenFile(digest, content, file_turn, file_turn)
+    return sent
+
 def get_chat_history() -> List[str]:
     """Get the current chat history"""
     return chat_his
@@ -129,10 +400,34 @@ def get_context() -> List[dict]:
     """Get the current context"""
     return context
 
+def run_file_reference_tests() -> None:
+    """Compact between two turns sharing files; kept messages must not point at evicted copies"""
+    global context, context_tokens, context_total, context_turns, seen_files, file_notes, summary_levels, summary_count
+    context, context_tokens, context_total, context_turns = [], [], 0, []
+    seen_files, file_notes, summary_levels, summary_count = {}, {}, [], 0
+
+    first = "\n".join(f"line {i}" for i in range(200)) + "\n"
+    changed = first.replace("line 100\n", "line 100 changed\n")
+    other = "x = 'same'\n"
+    for files in ({"a.py": first, "b.py": other}, {"a.py": changed, "b.py": other}):
+        append_context("user", f"files:\n{files_for_context(files)}", False)
+        append_context("assistant", "Done", False)
+    assert "see above" in context[2]["content"] and "unified diff" in context[2]["content"]
+
+    # Evict the first turn, which holds the only full copies
+    _replace_with_summary(2, ["Turn 1 summarized"])
+    kept = context[summary_count]["content"]
+    assert "see above" not in kept and "unified diff" not in kept, kept
+    assert kept == f"files:\n{ {'a.py': changed, 'b.py': other} }", kept
+    assert context_total == sum(_message_tokens(message) for message in context)
+    assert files_for_context({"a.py": changed})["a.py"] == changed
+
 # Test cases
 def run_tests() -> None:
     """Run test cases for the context management functions"""
     try:
+        run_file_reference_tests()
+
         # Test chat history with realistic conversation
         append_chat_history("Can you help me create a web scraper using Python?")
         assert len(get_chat_history()) == 1
@@ -1,54 +1,138 @@
-from ast import parse
 from tools.dir.file_exp import select_folder,is_folder_empty
-from model import chat
-from tools.memory.page_rank import CodeDependencyGraphGenerator
+from model import chat, chat_stream, achat, achat_stream
+from tools.memory.page_rank import CodeDependencyGraphGenerator, PATH_LIKE_RE
 from tools.memory.repoMap import map_repository
-from context_management import append_context,get_context
-from tools.dir.writing import handle_commands_from_text 
+from context_management import append_context,get_context,compact_context,needs_summary,files_for_context
+from tools.dir.writing import StreamingBlockHandler
 from tools.dir.read_file import parse_file_list,read_files_from_paths
 from tools.memory.dir_all_files import list_files_single_function
+from tools.memory.traversal import walk_repository
+from tools.memory.render import render_repo_map
+from tools.memory.symbol_search import SymbolSearch
+from tools.memory.snippets import read_snippets
+from tools.memory.watcher import RepoSnapshot, RepoWatcher
 import prompts
-import json
-from pathlib import Path
+import os
+import asyncio
 from output_struct import repo_reader
 
-#selecting the folder
-selected_folder = select_folder()
-generator = CodeDependencyGraphGenerator()
+# Upper bound on the repo map sent to the reader agent, whatever the repo size
+REPO_MAP_TOKENS = 4096
 
-print(f"Selected folder: {selected_folder}")
+# Set HILBERT_ASYNC=0 to make every model call of a turn one after another
+ASYNC_AGENT = os.environ.get("HILBERT_ASYNC", "1").lower() not in ("0", "false", "no", "off")
 
+# Set HILBERT_SNIPPETS=1 to send only the definitions a task names instead of
+# whole files. Excerpted files can only be changed with edit blocks, and a
+# whole-file block the model sends anyway would drop the omitted parts, so
+# this stays opt-in.
+SNIPPET_MODE = os.environ.get("HILBERT_SNIPPETS", "0").lower() in ("1", "true", "yes", "on")
 
-#reading the repo_map.json file
-def read_repo_map(file_path: str) -> dict:
-    """
-    Read and parse a repository map JSON file.
-    
-    Args:
-        file_path: Path to the JSON file
-        
-    Returns:
-        Dictionary containing the parsed JSON data
-        
-    Raises:
-        FileNotFoundError: If file doesn't exist
-        json.JSONDecodeError: If JSON is invalid
-    """
-    path = Path(file_path)
-    with path.open('r', encoding='utf-8') as f:
-        return json.load(f)
+# Appended to coding requests after the task and the files
+CODE_FORMAT_REMINDER = """This is the wrong format 
+example:
+```css
+// (styles/styles.css)
+code:
+
+but the correct is 
+```css
+(styles/styles.css)
+code:"""
 
 
 #chatting with the model
 def chat_with_model(system,prompt,model):
-    conversation = get_context()
-    conversation.append({"role": "user", "content": prompt})
-    append_context("user",prompt)   
-    chat_response = chat(system,conversation,model)
+    append_context("user",prompt)
+    chat_response = chat(system,get_context(),model)
     append_context("assistant",chat_response)
     return chat_response
 
 
+#streaming a coding reply, writing each code block as soon as it is complete
+# The prompt carries files_for_context() notes that point at earlier messages,
+# so it is appended without compacting; the reply's append compacts instead
+def stream_with_model(system,prompt,model,actual_path):
+    append_context("user",prompt,False)
+    handler = StreamingBlockHandler(actual_path)
+    chunks = []
+    for chunk in chat_stream(system,get_context(),model):
+        print(chunk, end="", flush=True)
+        chunks.append(chunk)
+        handler.feed(chunk)
+    print()
+    chat_response = "".join(chunks)
+    append_context("assistant",chat_response)
+    handler.finish()
+    return chat_response
+
+
+# The async loop summarizes in the background instead of in append_context
+async def achat_with_model(system,prompt,model):
+    append_context("user",prompt,False)
+    chat_response = await achat(system,list(get_context()),model)
+    append_context("assistant",chat_response,False)
+    return chat_response
+
+
+async def astream_with_model(system,prompt,model,actual_path):
+    append_context("user",prompt,False)
+    handler = StreamingBlockHandler(actual_path)
+    chunks = []
+    async for chunk in achat_stream(system,list(get_context()),model):
+        print(chunk, end="", flush=True)
+        chunks.append(chunk)
+        handler.feed(chunk)
+    print()
+    chat_response = "".join(chunks)
+    append_context("assistant",chat_response,False)
+    handler.finish()
+    return chat_response
+
+
+def files_named_in(text, files):
+    """Paths of `files` that `text` mentions as a whole path, in `files` order."""
+    named = set()
+    for word in PATH_LIKE_RE.findall(text):
+        # Drop a sentence's closing period and a leading ./
+        word = word.replace('\\', '/').rstrip('.')
+        named.add(word[2:] if word.startswith('./') else word)
+    return [path for path in files if path.replace('\\', '/') in named]
+
+
+def read_task_files(selected_folder, paths, text):
+    """Read the files picked for a task, whole or as snippets of what `text` names."""
+    if SNIPPET_MODE:
+        return read_snippets(selected_folder, paths, text)
+    return read_files_from_paths(selected_folder, paths)
+
+
+def ranked_repo_map(generator, prompt, all_files, extra_context=None, limit=30):
+    """
+    Rank the repo for a prompt with personalized PageRank.
+
+    Returns the most relevant files, highest first, and the repo map rendered
+    from that ranking within REPO_MAP_TOKENS.
+    """
+    recent = [message["content"] for message in get_context()[-4:]]
+    scores = generator.rank_for_query(prompt, context=recent + (extra_context or []))
+    ranked_files = list(generator.file_scores(scores))[:limit]
+    repo_map = render_repo_map(generator.ranked_symbols(scores), all_files, REPO_MAP_TOKENS)
+    return ranked_files, repo_map
+
+
+def mentioned_definitions(search, text):
+    """
+    Resolve identifiers mentioned in a prompt to where they are defined,
+    from the local symbol index instead of a model round-trip.
+    """
+    lines = []
+    for name, results in search.resolve_identifiers(text).items():
+        places = ", ".join(f"{result.path} ({result.code.strip()})" for result in results)
+        lines.append(f"{name}: {places}")
+    if not lines:
+        return ""
+    return "Symbols mentioned in the task are defined in:\n" + "\n".join(lines) + "\n"
 
 
 def reader_agent(repo_map,model):
@@ -58,44 +142,111 @@ def reader_agent(repo_map,model):
     """})
     chat_response = chat("You are an expert software engineer which can use repo map to navigate the repo and can ask for the relevant files to serve the user's demand",conversation,model)
     return chat_response
-   
 
 
-if is_folder_empty(selected_folder):
-    print("No repo to scan")
-else:
-    print("Repo to scan:",selected_folder)
-    print("Mapping repository...")
-    map_repository(selected_folder)
-    print("Generating graph...")
-    generator.generate_graph(f"{selected_folder}/.lagrange/repo_map.json")
+async def areader_agent(repo_map,model):
+    conversation = []
+    conversation.append({"role": "user", "content": f"""repo_map: {repo_map}
+    output structure: {repo_reader} only reply in the given format and no other words
+    """})
+    chat_response = await achat("You are an expert software engineer which can use repo map to navigate the repo and can ask for the relevant files to serve the user's demand",conversation,model)
+    return chat_response
+
+
+async def agent_loop(selected_folder, watcher):
+    """
+    The follow-up turns, with independent model calls made concurrently.
+
+    The reader picks files from the raw prompt while the architect writes the
+    plan, so a turn waits for the slower of the two instead of both; files
+    the plan names that the reader missed are read as well. Once the context
+    grows long, it is summarized in the background while the user types the
+    next prompt.
+    """
+    summary_task = None
+    while True:
+        prompt = await asyncio.to_thread(input, "Enter your prompt: ")
+        if prompt.lower() == "exit":
+            break
+        if summary_task is not None:
+            await summary_task
+            summary_task = None
+
+        # Always the latest snapshot: files written by earlier turns are already mapped
+        snapshot = watcher.snapshot
+        ranked_files, repo_map = ranked_repo_map(snapshot.generator, prompt, snapshot.files)
+        plan, files_to_read = await asyncio.gather(
+            achat_with_model(prompts.architect_prompt,prompt,"llama-3.3-70b-versatile"),
+            areader_agent(f"Files ranked by relevance to the task: {ranked_files} and repo_map (files without symbols are listed by path only):\n{repo_map}\n{mentioned_definitions(snapshot.search, prompt)}Now tell all the files to read for the task: {prompt}","llama-3.3-70b-versatile"),
+        )
+        print(plan)
+        santized_files = parse_file_list(files_to_read)
+        santized_files += [path for path in files_named_in(plan, snapshot.files) if path not in santized_files]
+        files = read_task_files(selected_folder,santized_files,prompt + ' ' + plan)
+        await astream_with_model(prompts.coding_prompt,f"""{plan}
+
+files:
+{files_for_context(files)}
 
+{CODE_FORMAT_REMINDER}""","llama-3.3-70b-versatile",selected_folder)
 
+        if needs_summary():
+            summary_task = asyncio.create_task(compact_context())
+
+    if summary_task is not None:
+        summary_task.cancel()
 
 
 if __name__ == "__main__":
+    # Startup lives under the main guard so that parser worker processes,
+    # which re-import this module on spawn-based platforms, don't re-run it.
+    #selecting the folder
+    selected_folder = select_folder()
+    generator = CodeDependencyGraphGenerator()
+
+    print(f"Selected folder: {selected_folder}")
+
+    # One walk of the tree feeds both the repo map and the file list
+    repo_files = []
+    file_maps = {}
+    search = SymbolSearch([])
+    if is_folder_empty(selected_folder):
+        print("No repo to scan")
+    else:
+        print("Repo to scan:",selected_folder)
+        print("Mapping repository...")
+        repo_files = walk_repository(selected_folder)
+        file_maps = map_repository(selected_folder, entries=repo_files)
+        print("Generating graph...")
+        generator.generate_graph(f"{selected_folder}/.lagrange/index.db", scan_references=True)
+        search = SymbolSearch.from_generator(generator)
+
+    # Refreshes the map, graph and symbol search in the background whenever
+    # files change, e.g. when the agent writes code between turns
+    watcher = RepoWatcher(selected_folder, RepoSnapshot(
+        0, file_maps, list_files_single_function(selected_folder, entries=repo_files), generator, search))
+    watcher.start()
+
     if is_folder_empty(selected_folder):
         print("Selected folder is empty")
         while True:
             prompt = input("Enter your prompt: ")
             if prompt.lower() == "exit":
                 break
-            chat_response = chat_with_model(prompts.coding_prompt,f"Make code files, and you are in the parent directory: {prompt}","llama-3.3-70b-versatile")
-            print(chat_response)
-            handle_commands_from_text(chat_response,selected_folder)
+            stream_with_model(prompts.coding_prompt,f"Make code files, and you are in the parent directory: {prompt}","llama-3.3-70b-versatile",selected_folder)
 
     prompt = input("Enter your prompt: ")
     print("Reading the repo....")
     
-    all_files_in_repo = list_files_single_function(selected_folder)
-    print(f"Found {len(all_files_in_repo)} files in the repo")
+    snapshot = watcher.snapshot
+    print(f"Found {len(snapshot.files)} files in the repo")
     
-    repo_map = read_repo_map(f"{selected_folder}/.lagrange/repo_map.json")
-    files_to_read = reader_agent(f"List of all files in the repo: {all_files_in_repo} and repo_map:{repo_map} Now tell all the files to read for the task: {prompt} <Instruction>You are in the parent directory don't write it</Instruction>","llama-3.3-70b-versatile")
+    ranked_files, repo_map = ranked_repo_map(snapshot.generator, prompt, snapshot.files)
+    files_to_read = reader_agent(f"Files ranked by relevance to the task: {ranked_files} and repo_map (files without symbols are listed by path only):\n{repo_map}\n{mentioned_definitions(snapshot.search, prompt)}Now tell all the files to read for the task: {prompt} <Instruction>You are in the parent directory don't write it</Instruction>","llama-3.3-70b-versatile")
     print(f"Reader Agent: {files_to_read}")
     
     santized_files = parse_file_list(files_to_read)
-    files = read_files_from_paths(selected_folder,santized_files)
+    files = read_task_files(selected_folder,santized_files,prompt)
     print(f"Reading the files: {files_to_read}")
     
     append_context("user", f"Use the repo_map: {repo_map} and help me with the following task {prompt}")
@@ -106,50 +257,33 @@ if __name__ == "__main__":
     
     append_context("user",f"Go on with the task {prompt}")
     
-    chat_response = chat_with_model(prompts.coding_prompt,f"""{prompt}
+    stream_with_model(prompts.coding_prompt,f"""{prompt}
 
 files:
-{files}
-
-
-This is the wrong format 
-example:
-```css
-// (styles/styles.css)
-code:
+{files_for_context(files)}
 
-but the correct is 
-```css
-(styles/styles.css)
-code:""","llama-3.3-70b-versatile")
-    print(chat_response)
-    handle_commands_from_text(chat_response,selected_folder)
+{CODE_FORMAT_REMINDER}""","llama-3.3-70b-versatile",selected_folder)
     
-    while True:
-        prompt = input("Enter your prompt: ")
-        if prompt.lower() == "exit":
-            break
-        plan = chat_with_model(prompts.architect_prompt,prompt,"llama-3.3-70b-versatile")
-        print(plan)
-        files_to_read = reader_agent(f"List of all files in the repo: {all_files_in_repo} and repo_map:{repo_map} Now tell all the files to read for the task: {plan}","llama-3.3-70b-versatile")
-        santized_files = parse_file_list(files_to_read)
-        files = read_files_from_paths(selected_folder,santized_files)
-        chat_response = chat_with_model(prompts.coding_prompt,f"""{plan}
+    if ASYNC_AGENT:
+        asyncio.run(agent_loop(selected_folder, watcher))
+    else:
+        while True:
+            prompt = input("Enter your prompt: ")
+            if prompt.lower() == "exit":
+                break
+            plan = chat_with_model(prompts.architect_prompt,prompt,"llama-3.3-70b-versatile")
+            print(plan)
+            # Always the latest snapshot: files written by earlier turns are already mapped
+            snapshot = watcher.snapshot
+            ranked_files, repo_map = ranked_repo_map(snapshot.generator, prompt, snapshot.files, extra_context=[plan])
+            files_to_read = reader_agent(f"Files ranked by relevance to the task: {ranked_files} and repo_map (files without symbols are listed by path only):\n{repo_map}\n{mentioned_definitions(snapshot.search, prompt + ' ' + plan)}Now tell all the files to read for the task: {plan}","llama-3.3-70b-versatile")
+            santized_files = parse_file_list(files_to_read)
+            files = read_task_files(selected_folder,santized_files,prompt + ' ' + plan)
+            stream_with_model(prompts.coding_prompt,f"""{plan}
 
 files:
-{files}
-
-This is the wrong format 
-example:
-```css
-// (styles/styles.css)
-code:
+{files_for_context(files)}
 
-but the correct is 
-```css
-(styles/styles.css)
-code:""","llama-3.3-70b-versatile")
-        print(chat_response)
-        handle_commands_from_text(chat_response,selected_folder)
+{CODE_FORMAT_REMINDER}""","llama-3.3-70b-versatile",selected_folder)
 
-        
\ No newline at end of file
+    watcher.stop()
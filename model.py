@@ -1,20 +1,190 @@
 import os
+import httpx
 from dotenv import load_dotenv
-from groq import Groq
+from groq import Groq, AsyncGroq, APIConnectionError
+from response_cache import ResponseCache
+from rate_limit import RequestScheduler, estimate_tokens
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Groq client
-client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+# Point at another server, e.g. a local stub, with GROQ_BASE_URL
+BASE_URL = os.environ.get("GROQ_BASE_URL") or None
+
+# Connections are kept alive and reused across requests
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=120)
+HTTP_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+# Initialize Groq client; retries are left to the scheduler
+client = Groq(
+    api_key=os.environ.get("GROQ_API_KEY"),
+    base_url=BASE_URL,
+    max_retries=0,
+    http_client=httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+)
+# Used by the async agent loop, so independent calls can be in flight together
+async_client = AsyncGroq(
+    api_key=os.environ.get("GROQ_API_KEY"),
+    base_url=BASE_URL,
+    max_retries=0,
+    http_client=httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT),
+)
+
+# Keeps every call within the per-model request and token limits
+scheduler = RequestScheduler.from_env(retry_errors=(APIConnectionError,))
+
+# Sampling parameters sent with every request; part of the cache key
+SAMPLING_PARAMS = {
+    "temperature": 0,
+    "max_tokens": 8000,
+    "top_p": 1,
+}
+
+# None when turned off with HILBERT_RESPONSE_CACHE=0
+response_cache = ResponseCache.from_env()
+
+def _cached(messages, model, use_cache):
+    """The response cache key of a request, or None when not caching, and its cached reply if any."""
+    if not use_cache or response_cache is None:
+        return None, None
+    key = response_cache.key(messages, model, SAMPLING_PARAMS)
+    return key, response_cache.get(key)
+
+def _store(key, content):
+    """Cache a reply under `key`; empty replies are not cached, so they aren't replayed."""
+    if key is not None and content:
+        response_cache.put(key, content)
+
+def _total_tokens(chat_completion):
+    """Tokens a completion counted against the rate limit, when reported."""
+    usage = getattr(chat_completion, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+def _stream_usage(chunk):
+    """Total tokens reported with a stream chunk; Groq sends them in `x_groq` on the last one."""
+    total = _total_tokens(chunk)
+    if total is not None:
+        return total
+    x_groq = getattr(chunk, "x_groq", None)
+    if isinstance(x_groq, dict):
+        usage = x_groq.get("usage") or {}
+        return usage.get("total_tokens") if isinstance(usage, dict) else getattr(usage, "total_tokens", None)
+    return getattr(getattr(x_groq, "usage", None), "total_tokens", None)
+
+def _settle_stream(model, tokens, total, parts):
+    """Charge a streamed reply to the token bucket, estimating it when no usage came back."""
+    if total is None:
+        total = tokens + len("".join(parts)) // 4
+    scheduler.settle(model, tokens, total)
 
 #calling the model
-def chat(system,conversation, model):
-    chat_completion = client.chat.completions.create(
-        messages=[{"role": "system", "content": system}] + conversation,
-        model=model,  
-        temperature=0,
-        max_tokens=8000,
-        top_p=1,
-    )
-    return chat_completion.choices[0].message.content
\ No newline at end of file
+def chat(system,conversation, model, use_cache=True):
+    messages = [{"role": "system", "content": system}] + conversation
+
+    # Temperature is 0, so a request seen before gets the same answer from disk
+    key, cached = _cached(messages, model, use_cache)
+    if cached is not None:
+        return cached
+
+    tokens = estimate_tokens(messages)
+    chat_completion = scheduler.call(model, tokens, lambda: client.chat.completions.create(
+        messages=messages,
+        model=model,
+        **SAMPLING_PARAMS,
+    ))
+    scheduler.settle(model, tokens, _total_tokens(chat_completion))
+    content = chat_completion.choices[0].message.content
+    _store(key, content)
+    return content
+
+
+def chat_stream(system, conversation, model, use_cache=True):
+    """
+    Like chat(), but yield the reply in pieces as the model generates it.
+
+    A cached reply is yielded in one piece; a streamed reply is cached once
+    it has been received completely, and its tokens, prompt and output, are
+    charged to the rate limit when the stream ends.
+    """
+    messages = [{"role": "system", "content": system}] + conversation
+
+    key, cached = _cached(messages, model, use_cache)
+    if cached is not None:
+        yield cached
+        return
+
+    tokens = estimate_tokens(messages)
+    stream = scheduler.call(model, tokens, lambda: client.chat.completions.create(
+        messages=messages,
+        model=model,
+        stream=True,
+        **SAMPLING_PARAMS,
+    ))
+    parts = []
+    total = None
+    try:
+        for chunk in stream:
+            total = _stream_usage(chunk) or total
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+    finally:
+        _settle_stream(model, tokens, total, parts)
+
+    _store(key, "".join(parts))
+
+
+async def achat(system, conversation, model, use_cache=True):
+    """Async version of chat(); shares its response cache."""
+    messages = [{"role": "system", "content": system}] + conversation
+
+    key, cached = _cached(messages, model, use_cache)
+    if cached is not None:
+        return cached
+
+    tokens = estimate_tokens(messages)
+    chat_completion = await scheduler.acall(model, tokens, lambda: async_client.chat.completions.create(
+        messages=messages,
+        model=model,
+        **SAMPLING_PARAMS,
+    ))
+    scheduler.settle(model, tokens, _total_tokens(chat_completion))
+    content = chat_completion.choices[0].message.content
+    _store(key, content)
+    return content
+
+
+async def achat_stream(system, conversation, model, use_cache=True):
+    """Async version of chat_stream()."""
+    messages = [{"role": "system", "content": system}] + conversation
+
+    key, cached = _cached(messages, model, use_cache)
+    if cached is not None:
+        yield cached
+        return
+
+    tokens = estimate_tokens(messages)
+    stream = await scheduler.acall(model, tokens, lambda: async_client.chat.completions.create(
+        messages=messages,
+        model=model,
+        stream=True,
+        **SAMPLING_PARAMS,
+    ))
+    parts = []
+    total = None
+    try:
+        async for chunk in stream:
+            total = _stream_usage(chunk) or total
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+    finally:
+        _settle_stream(model, tokens, total, parts)
+
+    _store(key, "".join(parts))
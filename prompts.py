@@ -54,6 +54,21 @@ coding_prompt = """
      [Your code here]
      ```
    - Focus on clean, modular, and functional implementation. Avoid unnecessary comments.
+   - Use a full `code:` block only for new files.
+
+**Editing Existing Files:**
+   - Change a file you were given with an `edit:` block instead of rewriting it. Each hunk copies the lines to change exactly, then gives their replacement:  
+     ```language
+     (relative_path/filename.ext)
+     edit:
+     <<<<<<< SEARCH
+     [Existing lines, copied exactly, with enough context to be unique]
+     =======
+     [Replacement lines]
+     >>>>>>> REPLACE
+     ```
+   - Put several hunks in one block to make several changes to a file, in the order they appear in it.
+   - Files shown as an excerpt with omitted lines must only be changed with `edit:` blocks.
 
 5. **Execution Instructions:**
    - Provide clear steps for running the application:  
@@ -109,6 +124,17 @@ def clean_data(dataframe):
     return dataframe
 ```
 
+**Editing an Existing File:**  
+```python
+(DataAnalyzer/data_processing/clean_data.py)
+edit:
+<<<<<<< SEARCH
+    dataframe = dataframe.dropna()
+=======
+    dataframe = dataframe.dropna(how="all")
+>>>>>>> REPLACE
+```
+
 **HTML Boilerplate:**  
 ```html
 (index.html)
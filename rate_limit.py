@@ -0,0 +1,211 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple
+
+# Override the per-model defaults below; 0 turns that limit off
+REQUESTS_PER_MINUTE_ENV = "HILBERT_REQUESTS_PER_MINUTE"
+TOKENS_PER_MINUTE_ENV = "HILBERT_TOKENS_PER_MINUTE"
+MAX_RETRIES_ENV = "HILBERT_MAX_RETRIES"
+
+# (requests per minute, tokens per minute) of the Groq free tier
+DEFAULT_LIMITS: Dict[str, Tuple[int, int]] = {
+    "llama-3.3-70b-versatile": (30, 12000),
+    "llama-3.1-8b-instant": (30, 6000),
+}
+FALLBACK_LIMITS = (30, 6000)
+
+# Statuses worth another attempt; anything else is the request's own fault
+RETRY_STATUSES = {408, 409, 429}
+
+
+def estimate_tokens(messages: list) -> int:
+    """Rough token count of chat messages, about four characters per token."""
+    return sum(len(message["content"] or "") // 4 + 4 for message in messages)
+
+
+def retry_after_seconds(response) -> Optional[float]:
+    """Delay asked for by a response's Retry-After header, in seconds, if any."""
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute`.
+
+    reserve() takes its amount right away, letting the level go negative,
+    and returns how long the caller must wait for the bucket to have covered
+    it. Callers are therefore served in the order they reserved, and sync and
+    async callers can share a bucket, each sleeping in its own way.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute if capacity is None else capacity
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` from the bucket; returns the seconds to wait before using it."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.level -= amount
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def refund(self, amount: float) -> None:
+        """Give back an over-estimate, or take more with a negative amount."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level + amount)
+
+
+class RequestScheduler:
+    """
+    Paces model requests to each model's request and token limits, and retries
+    failed ones.
+
+    Retryable failures (rate limits, timeouts, server errors and connection
+    errors) are retried up to `max_retries` times, waiting as long as the
+    Retry-After header asks or else a jittered exponential backoff. A rate
+    limit pauses every request to that model, not just the one that hit it.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[int, int]]] = None,
+                 default_limits: Tuple[int, int] = FALLBACK_LIMITS, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 60.0, retry_errors: tuple = ()):
+        """
+        Args:
+            limits: (requests per minute, tokens per minute) by model; 0 turns a limit off
+            default_limits: Limits of models not in `limits`
+            max_retries: Attempts after the first before giving up
+            base_delay: Backoff ceiling of the first retry, doubled for each further one
+            max_delay: Upper bound on any single wait
+            retry_errors: Exception types without a status code that are worth retrying
+        """
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.default_limits = default_limits
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_errors = retry_errors
+        self.buckets: Dict[str, Tuple[Optional[TokenBucket], Optional[TokenBucket]]] = {}
+        self.paused_until: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, retry_errors: tuple = ()) -> "RequestScheduler":
+        """The default limits, with the overrides set in the environment."""
+        requests = os.environ.get(REQUESTS_PER_MINUTE_ENV)
+        tokens = os.environ.get(TOKENS_PER_MINUTE_ENV)
+
+        def override(model_limits):
+            model_requests, model_tokens = model_limits
+            return (int(requests) if requests else model_requests, int(tokens) if tokens else model_tokens)
+
+        limits = {model: override(model_limits) for model, model_limits in DEFAULT_LIMITS.items()}
+        max_retries = int(os.environ.get(MAX_RETRIES_ENV) or 5)
+        return cls(limits, override(FALLBACK_LIMITS), max_retries=max_retries, retry_errors=retry_errors)
+
+    def _buckets(self, model: str):
+        with self.lock:
+            buckets = self.buckets.get(model)
+            if buckets is None:
+                requests, tokens = self.limits.get(model, self.default_limits)
+                buckets = self.buckets[model] = (TokenBucket(requests) if requests else None,
+                                                 TokenBucket(tokens) if tokens else None)
+            return buckets
+
+    def _reserve(self, model: str, tokens: int) -> float:
+        """Take one request and `tokens` tokens; returns the seconds to wait."""
+        request_bucket, token_bucket = self._buckets(model)
+        wait = self.paused_until.get(model, 0.0) - time.monotonic()
+        if request_bucket is not None:
+            wait = max(wait, request_bucket.reserve(1))
+        if token_bucket is not None:
+            # A request larger than a whole minute's budget waits for a full bucket
+            wait = max(wait, token_bucket.reserve(min(tokens, token_bucket.capacity)))
+        return max(0.0, wait)
+
+    def settle(self, model: str, estimated: int, actual: Optional[int]) -> None:
+        """Correct a reservation of `estimated` tokens once the real usage is known."""
+        token_bucket = self._buckets(model)[1]
+        if token_bucket is not None and actual is not None:
+            token_bucket.refund(min(estimated, token_bucket.capacity) - actual)
+
+    def _retry_delay(self, model: str, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after `error`, or None to give up."""
+        if attempt >= self.max_retries:
+            return None
+        status = getattr(error, "status_code", None)
+        if status is not None:
+            if status not in RETRY_STATUSES and status < 500:
+                return None
+        elif not isinstance(error, self.retry_errors):
+            return None
+
+        retry_after = retry_after_seconds(getattr(error, "response", None))
+        if retry_after is not None:
+            delay = min(retry_after, self.max_delay)
+        else:
+            # Full jitter, so that concurrent callers don't retry in lockstep
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if status == 429:
+            with self.lock:
+                self.paused_until[model] = max(self.paused_until.get(model, 0.0), time.monotonic() + delay)
+        return delay
+
+    def call(self, model: str, tokens: int, request: Callable):
+        """Run `request()` within the limits of `model`, retrying it as needed."""
+        attempt = 0
+        while True:
+            wait = self._reserve(model, tokens)
+            if wait:
+                time.sleep(wait)
+            try:
+                return request()
+            except Exception as e:
+                # A failed request used none of the tokens reserved for it
+                self.settle(model, tokens, 0)
+                delay = self._retry_delay(model, e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            time.sleep(delay)
+
+    async def acall(self, model: str, tokens: int, request: Callable):
+        """Async version of call(); `request()` returns an awaitable."""
+        attempt = 0
+        while True:
+            wait = self._reserve(model, tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            try:
+                return await request()
+            except Exception as e:
+                # A failed request used none of the tokens reserved for it
+                self.settle(model, tokens, 0)
+                delay = self._retry_delay(model, e, attempt)
+                if delay is None:
+                    raise
+            attempt += 1
+            await asyncio.sleep(delay)
@@ -0,0 +1,124 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+# Set HILBERT_RESPONSE_CACHE=0 to always call the API
+CACHE_ENABLED_ENV = "HILBERT_RESPONSE_CACHE"
+CACHE_DIR_ENV = "HILBERT_CACHE_DIR"
+CACHE_MAX_BYTES_ENV = "HILBERT_CACHE_MAX_BYTES"
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "hilbert" / "responses"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ResponseCache:
+    """
+    On-disk, content-addressed cache of model responses.
+
+    Each response is stored in its own file named after the SHA-256 of the
+    request (system prompt, messages, model and sampling parameters), so
+    identical requests hit the same entry across runs. Hits refresh the
+    file's mtime, and when the cache grows past `max_bytes` the least
+    recently used entries are deleted until it is back under 90% of it.
+    """
+
+    def __init__(self, directory: Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """The cache configured by the environment, or None when it is turned off."""
+        if os.environ.get(CACHE_ENABLED_ENV, "1").lower() in ("0", "false", "no", "off"):
+            return None
+        directory = os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+        max_bytes = int(os.environ.get(CACHE_MAX_BYTES_ENV) or DEFAULT_MAX_BYTES)
+        return cls(Path(directory).expanduser(), max_bytes)
+
+    @staticmethod
+    def key(messages: list, model: str, params: dict) -> str:
+        request = {"messages": messages, "model": model, "params": params}
+        encoded = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = json.load(f)["content"]
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return content
+
+    def put(self, key: str, content: str) -> None:
+        path = self._path(key)
+        data = json.dumps({"content": content}, ensure_ascii=False).encode("utf-8")
+        size = self._current_size()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            previous = path.stat().st_size if path.exists() else 0
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not cache model response: {e}")
+            return
+
+        self._size = size + len(data) - previous
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        """(mtime, size, path) of every cached response."""
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _current_size(self) -> int:
+        # Scanned once per process, then tracked as entries are written
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        return self._size
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the cache is under 90% of max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry[0])
+        size = sum(entry_size for _, entry_size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            size -= entry_size
+        self._size = size
+
+    def clear(self) -> None:
+        for _, _, path in self._entries():
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        self._size = 0
@@ -0,0 +1,138 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Upper bound on the bytes held by the shared cache
+CACHE_MAX_BYTES_ENV = "HILBERT_CONTENT_CACHE_BYTES"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class _Entry:
+    __slots__ = ('mtime_ns', 'size', 'data', 'texts', 'cost')
+
+    def __init__(self, mtime_ns: int, size: int, data: bytes):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.data = data
+        # Decoded forms, keyed by the `errors` mode they were decoded with
+        self.texts: Dict[str, str] = {}
+        self.cost = len(data)
+
+
+class ContentCache:
+    """
+    Process-wide LRU cache of repository file contents.
+
+    Entries are keyed by absolute path and only served while the file's
+    mtime_ns and size still match, so a hit costs one stat() and no read.
+    Decoded text is kept next to the bytes, so repeated reads don't decode
+    again either. When the cached bytes pass `max_bytes`, the least recently
+    used entries are dropped; files larger than that are never cached.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'ContentCache':
+        return cls(int(os.environ.get(CACHE_MAX_BYTES_ENV) or DEFAULT_MAX_BYTES))
+
+    def _lookup(self, path: str) -> Tuple[str, _Entry]:
+        """The up-to-date entry for a file, reading it on a miss."""
+        key = os.path.abspath(path)
+        stat = os.stat(key)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return key, entry
+            self.misses += 1
+
+        with open(key, 'rb') as f:
+            # Validated against the stat of the file actually read
+            stat = os.fstat(f.fileno())
+            entry = _Entry(stat.st_mtime_ns, stat.st_size, f.read())
+        self._store(key, entry)
+        return key, entry
+
+    def _store(self, key: str, entry: _Entry) -> None:
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.cost
+            if entry.cost > self.max_bytes:
+                return
+            self.entries[key] = entry
+            self.size += entry.cost
+            self._evict()
+
+    def _evict(self) -> None:
+        # Called with the lock held
+        while self.size > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.cost
+
+    def read_bytes(self, path: str) -> bytes:
+        """
+        Raw content of a file.
+
+        Raises:
+            OSError: If the file can't be stat'ed or read
+        """
+        return self._lookup(path)[1].data
+
+    def read_text(self, path: str, errors: str = 'strict') -> str:
+        """
+        Content of a file decoded as UTF-8, with newlines translated the way
+        text-mode open() does.
+
+        Raises:
+            OSError: If the file can't be stat'ed or read
+            UnicodeDecodeError: If the file isn't UTF-8 and `errors` is 'strict'
+        """
+        key, entry = self._lookup(path)
+        text = entry.texts.get(errors)
+        if text is None:
+            text = entry.data.decode('utf-8', errors=errors)
+            if '\r' in text:
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+            with self.lock:
+                if self.entries.get(key) is entry:
+                    entry.texts[errors] = text
+                    entry.cost += len(text)
+                    self.size += len(text)
+                    self._evict()
+        return text
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Drop one file, or everything when no path is given."""
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+                self.size = 0
+                return
+            entry = self.entries.pop(os.path.abspath(path), None)
+            if entry is not None:
+                self.size -= entry.cost
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries), 'bytes': self.size}
+
+
+# Shared by tools/memory and tools/dir
+content_cache = ContentCache.from_env()
+
+
+def read_bytes(path: str) -> bytes:
+    return content_cache.read_bytes(path)
+
+
+def read_text(path: str, errors: str = 'strict') -> str:
+    return content_cache.read_text(path, errors)
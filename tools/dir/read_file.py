@@ -1,7 +1,19 @@
 import json
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import Dict, List, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
 import ast
+from tools.content_cache import read_bytes, read_text
+
+# Threads reading files at once; most of their time is spent waiting on I/O
+MAX_READ_WORKERS = 32
+# Per-file and per-call caps on the text returned
+MAX_FILE_BYTES = 256 * 1024
+MAX_TOTAL_BYTES = 1024 * 1024
+# Leading bytes checked for NUL to tell binary files apart
+SNIFF_BYTES = 8192
+# Tried in order; Latin-1 decodes anything
+TEXT_ENCODINGS = ('utf-8-sig', 'cp1252', 'latin-1')
 
 def parse_file_list(file_list_str: str) -> List[str]:
     """
@@ -18,9 +30,65 @@ def parse_file_list(file_list_str: str) -> List[str]:
             paths = escaped_str.replace('[', '').replace(']', '').split(',')
             return [p.strip().strip('"\'') for p in paths if p.strip()]
 
-def read_files_from_paths(parent_dir: Union[str, Path], file_paths: Union[str, List[str]]) -> Dict[str, str]:
+def _decode(data: bytes) -> str:
+    """Decode file content, falling back from UTF-8 to Windows-1252 and Latin-1."""
+    for encoding in TEXT_ENCODINGS:
+        try:
+            text = data.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        # Latin-1 maps every byte, so this is only reached if it was removed
+        text = data.decode('utf-8', errors='replace')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+def _read_one(full_path: Path, max_file_bytes: int) -> Tuple[str, str]:
+    """
+    Read one file for read_files_from_paths().
+
+    Returns (status, content) with status 'ok', 'truncated', 'binary',
+    'missing' or 'error'; content is the error message for the last two.
+    """
+    try:
+        size = full_path.stat().st_size
+        if size > max_file_bytes:
+            # Read just the capped prefix, and leave the cache to whole files
+            with open(full_path, 'rb') as f:
+                data = f.read(min(SNIFF_BYTES, max_file_bytes))
+                if b'\0' in data:
+                    return 'binary', ''
+                data += f.read(max(0, max_file_bytes - len(data)))
+            # Cut at a line boundary so the last line isn't a fragment
+            cut = data.rfind(b'\n')
+            return 'truncated', _decode(data[:cut + 1] if cut != -1 else data)
+
+        data = read_bytes(str(full_path))
+        if b'\0' in data[:SNIFF_BYTES]:
+            return 'binary', ''
+        try:
+            return 'ok', read_text(str(full_path))
+        except UnicodeDecodeError:
+            return 'ok', _decode(data)
+    except FileNotFoundError:
+        return 'missing', ''
+    except Exception as e:
+        return 'error', str(e)
+
+def read_files_from_paths(parent_dir: Union[str, Path], file_paths: Union[str, List[str]],
+                          max_file_bytes: int = MAX_FILE_BYTES, max_total_bytes: int = MAX_TOTAL_BYTES,
+                          max_workers: int = MAX_READ_WORKERS) -> Dict[str, str]:
     """
     Read files and return their complete contents.
+
+    Files are read concurrently on a thread pool, so on a slow or network
+    file system the whole set costs about one round trip. Binary files
+    (a NUL byte in the first block) are skipped, files over `max_file_bytes`
+    are cut at a line boundary, and once `max_total_bytes` (as UTF-8) have
+    been returned the remaining files are left out. Content that isn't UTF-8 is
+    decoded as Windows-1252 or Latin-1. The result is in request order.
     """
     parent_path = Path(parent_dir).resolve()
     
@@ -29,25 +97,42 @@ def read_files_from_paths(parent_dir: Union[str, Path], file_paths: Union[str, L
     else:
         paths_list = file_paths
 
+    normalized_paths = [str(Path(path)) for path in paths_list]
+    workers = max(1, min(max_workers, len(normalized_paths)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(
+            lambda normalized_path: _read_one(parent_path / normalized_path, max_file_bytes), normalized_paths))
+
     file_contents: Dict[str, str] = {}
+    total = 0
 
-    for path in paths_list:
-        normalized_path = str(Path(path))
+    for normalized_path, (status, content) in zip(normalized_paths, results):
         full_path = parent_path / normalized_path
         
         print(f"\n{'='*80}")
         print(f"File: {normalized_path}")
         print('='*80)
         
-        try:
-            with open(full_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                file_contents[normalized_path] = content
-                print(content)
-        except FileNotFoundError:
+        if status == 'missing':
             print(f"WARNING: File not found: {full_path}")
-        except Exception as e:
-            print(f"ERROR reading file {full_path}: {str(e)}")
+        elif status == 'error':
+            print(f"ERROR reading file {full_path}: {content}")
+        elif status == 'binary':
+            print(f"WARNING: Skipping binary file: {full_path}")
+        elif total >= max_total_bytes:
+            print(f"WARNING: Skipping {full_path}, {max_total_bytes} bytes already read")
+        else:
+            size = len(content.encode('utf-8'))
+            if total + size > max_total_bytes:
+                # Cut the UTF-8 form, dropping a character split at the end
+                content = content.encode('utf-8')[:max_total_bytes - total].decode('utf-8', errors='ignore')
+                size = len(content.encode('utf-8'))
+                status = 'truncated'
+            if status == 'truncated':
+                content += f"\n... truncated after {len(content)} characters ...\n"
+            total += size
+            file_contents[normalized_path] = content
+            print(content)
 
     return file_contents
 
@@ -3,6 +3,7 @@ import os
 import subprocess
 import sys
 import platform
+import difflib
 
 def run_command(command):
     """Run a shell command and handle output and errors with improved debugging."""
@@ -56,6 +57,166 @@ def run_command(command):
         print(f"An unexpected error occurred while running command '{command}': {str(e)}")
         return False
 
+# Languages whose blocks are written to files, and shells whose blocks are run
+SUPPORTED_LANGUAGES = [
+    'python', 'javascript', 'js', 'c++', 'cpp', 'c', 'html', 'css', 'dart', 'java', 'ruby', 'go', 'typescript', 'php', 'swift', 'kotlin','markdown','json','GIT', 'yaml','xml','tsx','text'
+]
+SUPPORTED_SHELLS = [
+    'shell', 'sh', 'ps1', 'bash','cmd', 'bat', 'vbs', 'ksh'
+]
+
+# A block looks like ```<language>\n(<relative path>)\ncode: <content>```; the path
+# is kept to one line, so a match can't run on into the next block
+languages_pattern = '|'.join([re.escape(lang) for lang in SUPPORTED_LANGUAGES])
+CODE_BLOCK_PATTERN = re.compile(rf"```({languages_pattern})\s*\n\(([^)\n]+)\)\ncode:\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+shells_pattern = '|'.join([re.escape(lang) for lang in SUPPORTED_SHELLS])
+SHELL_BLOCK_PATTERN = re.compile(rf"```({shells_pattern})\s*\n\(([^)\n]+)\)\ncode:\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+# An edit block has `edit:` in place of `code:` and one or more hunks of
+#   <<<<<<< SEARCH / lines to find / ======= / replacement / >>>>>>> REPLACE
+EDIT_BLOCK_PATTERN = re.compile(rf"```({languages_pattern}|{shells_pattern})\s*\n\(([^)\n]+)\)\nedit:[^\n]*\n(.*?)```", re.DOTALL | re.IGNORECASE)
+HUNK_PATTERN = re.compile(r"^<{5,9} ?SEARCH[^\n]*\n(.*?)^={5,9}[^\n]*\n(.*?)^>{5,9} ?REPLACE[^\n]*$", re.DOTALL | re.MULTILINE)
+# Lowest similarity at which a search text may match lines that differ from it
+FUZZY_MATCH_THRESHOLD = 0.85
+
+def write_code_block(actual_path, relative_path, code):
+    """Write the content of a code block to `relative_path` under `actual_path`."""
+    filepath = os.path.join(actual_path, relative_path)
+    directory = os.path.dirname(filepath)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    with open(filepath, 'w', encoding='utf-8') as file:
+        file.write(code.strip())
+
+def run_shell_block(actual_path, command):
+    """Save the content of a shell block as a script in `actual_path` and run it."""
+    shell_file_name = "commands.bat" if sys.platform == 'win32' else "commands.sh"
+    shell_file_path = os.path.join(actual_path, shell_file_name)
+
+    with open(shell_file_path, 'w') as shell_file:
+        if sys.platform != 'win32':
+            shell_file.write("#!/bin/bash\n")
+        for commands in command:
+            shell_file.write(commands.strip())
+
+    if sys.platform != 'win32':
+        os.chmod(shell_file_path, 0o755)
+    run_command(f'"{shell_file_path}"')
+
+def _reindent(lines, found_indent, search_indent):
+    """Shift replacement lines from the search text's indentation to the file's."""
+    if found_indent == search_indent:
+        return lines
+    shifted = []
+    for line in lines:
+        if line.strip() and line.startswith(search_indent):
+            line = found_indent + line[len(search_indent):]
+        shifted.append(line)
+    return shifted
+
+def _leading_whitespace(lines):
+    for line in lines:
+        if line.strip():
+            return line[:len(line) - len(line.lstrip())]
+    return ""
+
+def _find_lines(lines, search_lines):
+    """
+    Where `search_lines` occur in `lines` as (start, end), first ignoring
+    indentation and trailing whitespace, then as the most similar run of
+    lines of the same length, or None.
+    """
+    count = len(search_lines)
+    stripped_search = [line.strip() for line in search_lines]
+    stripped = [line.strip() for line in lines]
+    for start in range(len(lines) - count + 1):
+        if stripped[start:start + count] == stripped_search:
+            return start, start + count
+
+    target = "\n".join(stripped_search)
+    matcher = difflib.SequenceMatcher(None, "", target, autojunk=False)
+    best = None
+    best_ratio = FUZZY_MATCH_THRESHOLD
+    for start in range(len(lines) - count + 1):
+        matcher.set_seq1("\n".join(stripped[start:start + count]))
+        if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio >= best_ratio:
+            best, best_ratio = (start, start + count), ratio
+    return best
+
+def apply_hunk(content, search, replace):
+    """
+    Replace `search` in `content` with `replace`.
+
+    The search text is first looked up exactly, then line by line ignoring
+    indentation, then fuzzily; the replacement is re-indented to match what
+    was found. An empty search text appends. Returns None when nothing
+    matches.
+    """
+    if not search.strip():
+        if content and not content.endswith("\n"):
+            content += "\n"
+        return content + replace
+    if search in content:
+        return content.replace(search, replace, 1)
+
+    lines = content.splitlines(keepends=True)
+    search_lines = search.splitlines(keepends=True)
+    found = _find_lines(lines, search_lines)
+    if found is None:
+        return None
+    start, end = found
+    replace_lines = _reindent(replace.splitlines(keepends=True),
+                              _leading_whitespace(lines[start:end]), _leading_whitespace(search_lines))
+    if replace_lines and end == len(lines) and not lines[-1].endswith("\n"):
+        # Keep the file's missing final newline
+        replace_lines[-1] = replace_lines[-1].rstrip("\n")
+    return "".join(lines[:start] + replace_lines + lines[end:])
+
+def apply_edit_block(actual_path, relative_path, edit):
+    """
+    Apply the search/replace hunks of an edit block to `relative_path` under
+    `actual_path`. A hunk that doesn't match is reported and skipped. The
+    file keeps its line endings, and is only written when a hunk changed it.
+
+    Returns:
+        bool: Whether every hunk was applied
+    """
+    filepath = os.path.join(actual_path, relative_path)
+    hunks = HUNK_PATTERN.findall(edit)
+    if not hunks:
+        print(f"Warning: Edit block for {relative_path} has no SEARCH/REPLACE hunks")
+        return False
+    try:
+        with open(filepath, 'r', encoding='utf-8', newline='') as file:
+            original = file.read()
+    except FileNotFoundError:
+        original = ""
+    # Hunks come with \n endings, so a CRLF file is edited as LF and converted back
+    crlf = '\r\n' in original
+    content = original.replace('\r\n', '\n') if crlf else original
+
+    applied = True
+    for search, replace in hunks:
+        updated = apply_hunk(content, search, replace)
+        if updated is None:
+            print(f"Warning: Could not find the text to replace in {relative_path}:\n{search}")
+            applied = False
+            continue
+        content = updated
+
+    if crlf:
+        content = content.replace('\n', '\r\n')
+    if content == original:
+        return applied
+    directory = os.path.dirname(filepath)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    with open(filepath, 'w', encoding='utf-8', newline='') as file:
+        file.write(content)
+    return applied
+
 def handle_commands_from_text(text, actual_path):
     """Parse the provided text and handle code blocks and shell commands.
     
@@ -63,52 +224,136 @@ def handle_commands_from_text(text, actual_path):
         text (str): The text to parse for commands
         actual_path (str): The directory where code will be saved
     """
-    # Define supported programming languages
-    supported_languages = [
-        'python', 'javascript', 'js', 'c++', 'cpp', 'c', 'html', 'css', 'dart', 'java', 'ruby', 'go', 'typescript', 'php', 'swift', 'kotlin','markdown','json','GIT', 'yaml','xml','tsx','text'
-    ]
-    supported_shells = [
-        'shell', 'sh', 'ps1', 'bash','cmd', 'bat', 'vbs', 'ksh'
-    ]
-    
-    # Create regex patterns for supported languages
-    languages_pattern = '|'.join([re.escape(lang) for lang in supported_languages])
-    python_pattern = rf"```({languages_pattern})\s*\n\((.+?)\)\ncode:\s*(.*?)```"
-    shells_pattern = '|'.join([re.escape(lang) for lang in supported_shells])
-    shell_pattern = rf"```({shells_pattern})\s*\n\((.+?)\)\ncode:\s*(.*?)```"
+    python_matches = CODE_BLOCK_PATTERN.findall(text)
+    edit_matches = EDIT_BLOCK_PATTERN.findall(text)
+    shell_matches = SHELL_BLOCK_PATTERN.findall(text)
 
-    python_matches = re.findall(python_pattern, text, re.DOTALL | re.IGNORECASE)
-    shell_matches = re.findall(shell_pattern, text, re.DOTALL | re.IGNORECASE)
-
-    if not python_matches and not shell_matches:
+    if not python_matches and not edit_matches and not shell_matches:
         return
 
     passpath = ""
     # Handle code blocks for supported languages
     for language, relative_path, code in python_matches:
-        filepath = os.path.join(actual_path, relative_path)
         passpath = relative_path
-        directory = os.path.dirname(filepath)
-        if directory and not os.path.exists(directory):
-            os.makedirs(directory, exist_ok=True)
-        with open(filepath, 'w', encoding='utf-8') as file:
-            file.write(code.strip())
+        write_code_block(actual_path, relative_path, code)
+
+    # Handle edits to existing files
+    for language, relative_path, edit in edit_matches:
+        passpath = relative_path
+        apply_edit_block(actual_path, relative_path, edit)
 
     # Handle shell commands
     for language, relative_path, command in shell_matches:
-        shell_file_name = "commands.bat" if sys.platform == 'win32' else "commands.sh"
-        shell_file_path = os.path.join(actual_path, shell_file_name)
-        
-        with open(shell_file_path, 'w') as shell_file:
-            if sys.platform != 'win32':
-                shell_file.write("#!/bin/bash\n")
-            for commands in command:
-                shell_file.write(commands.strip())
-
-        if sys.platform != 'win32':
-            os.chmod(shell_file_path, 0o755)
-        run_command(f'"{shell_file_path}"')
+        run_shell_block(actual_path, command)
     
     # Return the first segment of the path if it contains subdirectories
     passpath = passpath.split("/")[0] if passpath else ""
-    return passpath
\ No newline at end of file
+    return passpath
+
+class StreamingBlockHandler:
+    """
+    Applies code blocks from a response while it is still being generated.
+
+    Text is fed in as it arrives; each code or edit block is applied to disk
+    as soon as its closing fence has been received. Shell blocks are only collected,
+    and run by finish() once the whole response is in, so that commands see
+    every file the response writes, as with handle_commands_from_text().
+    """
+
+    def __init__(self, actual_path):
+        self.actual_path = actual_path
+        self.buffer = ""
+        # Everything before this offset has already been handled
+        self.pos = 0
+        self.written = []
+        self.shell_commands = []
+
+    def feed(self, text):
+        """Add a piece of the response and apply any blocks it completes."""
+        self.buffer += text
+        # A block can only be completed by its closing fence
+        if '`' not in text:
+            return
+        while True:
+            code_match = CODE_BLOCK_PATTERN.search(self.buffer, self.pos)
+            edit_match = EDIT_BLOCK_PATTERN.search(self.buffer, self.pos)
+            shell_match = SHELL_BLOCK_PATTERN.search(self.buffer, self.pos)
+            matches = [match for match in (code_match, edit_match, shell_match) if match]
+            if not matches:
+                return
+            match = min(matches, key=lambda m: m.start())
+            language, relative_path, content = match.groups()
+            if match is code_match:
+                write_code_block(self.actual_path, relative_path, content)
+                self.written.append(relative_path)
+            elif match is edit_match:
+                apply_edit_block(self.actual_path, relative_path, content)
+                self.written.append(relative_path)
+            else:
+                self.shell_commands.append(content)
+            self.pos = match.end()
+
+    def finish(self):
+        """Run the collected shell blocks; returns what handle_commands_from_text() would."""
+        if not self.written and not self.shell_commands:
+            return
+        for command in self.shell_commands:
+            run_shell_block(self.actual_path, command)
+        passpath = self.written[-1] if self.written else ""
+        return passpath.split("/")[0] if passpath else ""
+
+
+# Test cases
+def run_tests() -> None:
+    """Run test cases for block parsing, streamed in pieces and fed whole"""
+    import tempfile
+
+    edit_block = """```python
+(pkg/a.py)
+edit:
+<<<<<<< SEARCH
+x = 1
+=======
+x = 2
+>>>>>>> REPLACE
+```
+"""
+    code_block = """```python
+(pkg/b.py)
+code:
+y = 1
+```
+"""
+    replies = {"edit then code": "Plan\n" + edit_block + code_block,
+               "code then edit": "Plan\n" + code_block + edit_block}
+    for name, reply in replies.items():
+        for piece_size in (len(reply), 7):
+            with tempfile.TemporaryDirectory() as actual_path:
+                os.makedirs(os.path.join(actual_path, "pkg"))
+                with open(os.path.join(actual_path, "pkg", "a.py"), "w", encoding="utf-8") as file:
+                    file.write("x = 1\n")
+                handler = StreamingBlockHandler(actual_path)
+                for start in range(0, len(reply), piece_size):
+                    handler.feed(reply[start:start + piece_size])
+                assert handler.finish() == "pkg", name
+                assert sorted(handler.written) == ["pkg/a.py", "pkg/b.py"], (name, handler.written)
+                with open(os.path.join(actual_path, "pkg", "a.py"), encoding="utf-8") as file:
+                    assert file.read() == "x = 2\n", name
+                with open(os.path.join(actual_path, "pkg", "b.py"), encoding="utf-8") as file:
+                    assert file.read() == "y = 1", name
+                assert sorted(os.listdir(os.path.join(actual_path, "pkg"))) == ["a.py", "b.py"], name
+
+            with tempfile.TemporaryDirectory() as actual_path:
+                os.makedirs(os.path.join(actual_path, "pkg"))
+                with open(os.path.join(actual_path, "pkg", "a.py"), "w", encoding="utf-8") as file:
+                    file.write("x = 1\n")
+                assert handle_commands_from_text(reply, actual_path) == "pkg", name
+                with open(os.path.join(actual_path, "pkg", "a.py"), encoding="utf-8") as file:
+                    assert file.read() == "x = 2\n", name
+                assert sorted(os.listdir(os.path.join(actual_path, "pkg"))) == ["a.py", "b.py"], name
+
+    print("All tests passed!")
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,179 @@
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tools.memory.symbols import extract_symbol_name
+
+INDEX_FILE = 'index.db'
+# Bump whenever the tables below change; an index with another version is rebuilt
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    parser_version INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS symbols (
+    path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    name TEXT NOT NULL,
+    line INTEGER,
+    end_line INTEGER,
+    PRIMARY KEY (path, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS symbols_by_name ON symbols (name);
+CREATE TABLE IF NOT EXISTS scores (
+    node TEXT PRIMARY KEY,
+    path TEXT,
+    score REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC);
+"""
+
+
+class RepoIndex:
+    """
+    SQLite-backed store for the repo map, the parse manifest and PageRank
+    scores, kept in .lagrange/index.db.
+
+    Opening the index reads nothing but the schema version; file maps,
+    symbols and scores are fetched by query, so callers that need one file or
+    one symbol never deserialize the whole map. Updates are applied per file
+    in a single transaction, so an unchanged repository costs no writes.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        # WAL lets readers keep querying while a remap writes
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            with self.conn:
+                for table in ('files', 'symbols', 'scores'):
+                    self.conn.execute(f'DROP TABLE IF EXISTS {table}')
+                self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.conn.executescript(_SCHEMA)
+
+    @classmethod
+    def for_repository(cls, repo_path: str) -> 'RepoIndex':
+        """Open the index of a repository, creating .lagrange if needed."""
+        codemap_dir = Path(repo_path) / '.lagrange'
+        codemap_dir.mkdir(exist_ok=True)
+        return cls(str(codemap_dir / INDEX_FILE))
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> 'RepoIndex':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def is_empty(self) -> bool:
+        return self.conn.execute('SELECT 1 FROM files LIMIT 1').fetchone() is None
+
+    def manifest(self) -> Dict[str, dict]:
+        """Manifest entries of every parsed file, keyed by relative path."""
+        return {
+            path: {'size': size, 'mtime_ns': mtime_ns, 'hash': file_hash, 'parser_version': parser_version}
+            for path, size, mtime_ns, file_hash, parser_version in self.conn.execute(
+                'SELECT path, size, mtime_ns, hash, parser_version FROM files')
+        }
+
+    def load_map(self) -> Dict[str, List[str]]:
+        """Symbol lines of every file that has any, in path order."""
+        repo_map: Dict[str, List[str]] = {}
+        for path, code in self.conn.execute('SELECT path, code FROM symbols ORDER BY path, position'):
+            repo_map.setdefault(path, []).append(code)
+        return repo_map
+
+    def as_dict(self) -> Dict[str, dict]:
+        """The map in the repo_map.json layout, for code that consumes that format."""
+        return {path: {'path': path, 'symbols': symbols} for path, symbols in self.load_map().items()}
+
+    def paths(self) -> List[str]:
+        """Paths of the files that have symbols."""
+        return [row[0] for row in self.conn.execute('SELECT DISTINCT path FROM symbols ORDER BY path')]
+
+    def load_definitions(self) -> Dict[str, List[Tuple[str, Optional[int], Optional[int]]]]:
+        """(symbol line, first line, last line) of every definition, by path."""
+        definitions: Dict[str, List[Tuple[str, Optional[int], Optional[int]]]] = {}
+        for path, code, line, end_line in self.conn.execute(
+                'SELECT path, code, line, end_line FROM symbols ORDER BY path, position'):
+            definitions.setdefault(path, []).append((code, line, end_line))
+        return definitions
+
+    def definitions_for(self, path: str) -> List[Tuple[str, str, Optional[int], Optional[int]]]:
+        """(name, symbol line, first line, last line) of one file's definitions, in file order."""
+        return self.conn.execute(
+            'SELECT name, code, line, end_line FROM symbols WHERE path = ? ORDER BY position', (path,)).fetchall()
+
+    def symbols_for(self, path: str) -> List[str]:
+        """Symbol lines of one file, in file order."""
+        return [row[0] for row in self.conn.execute(
+            'SELECT code FROM symbols WHERE path = ? ORDER BY position', (path,))]
+
+    def find_symbol(self, name: str) -> List[Tuple[str, int, str]]:
+        """(path, position, symbol line) of every definition with this name."""
+        return self.conn.execute(
+            'SELECT path, position, code FROM symbols WHERE name = ? ORDER BY path, position', (name,)).fetchall()
+
+    def update(self, symbols: Dict[str, List[str]], manifest: Dict[str, dict],
+               removed: Iterable[str] = (), clear: bool = False,
+               spans: Optional[Dict[str, List[Tuple[int, int]]]] = None) -> None:
+        """
+        Apply one remap in a single transaction.
+
+        Args:
+            symbols: New symbol lines of every added or changed file; an empty
+                list removes the file's symbols
+            manifest: Manifest entries that are new or differ from the stored ones
+            removed: Paths no longer in the repository
+            clear: Drop everything stored before applying the update
+            spans: First and last line of each symbol's definition, by path
+        """
+        with self.conn:
+            if clear:
+                self.conn.execute('DELETE FROM files')
+                self.conn.execute('DELETE FROM symbols')
+            for path in removed:
+                self.conn.execute('DELETE FROM files WHERE path = ?', (path,))
+                self.conn.execute('DELETE FROM symbols WHERE path = ?', (path,))
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO files (path, size, mtime_ns, hash, parser_version) VALUES (?, ?, ?, ?, ?)',
+                ((path, entry['size'], entry['mtime_ns'], entry['hash'], entry['parser_version'])
+                 for path, entry in manifest.items()))
+            for path, lines in symbols.items():
+                self.conn.execute('DELETE FROM symbols WHERE path = ?', (path,))
+                file_spans = (spans or {}).get(path) or [(None, None)] * len(lines)
+                self.conn.executemany(
+                    'INSERT INTO symbols (path, position, code, name, line, end_line) VALUES (?, ?, ?, ?, ?, ?)',
+                    ((path, position, code, extract_symbol_name(code)[0], first, last)
+                     for position, (code, (first, last)) in enumerate(zip(lines, file_spans))))
+
+    def save_scores(self, scores: Dict[str, float], paths: Dict[str, Optional[str]]) -> None:
+        """
+        Replace the stored PageRank scores.
+
+        Args:
+            scores: Score of every graph node
+            paths: File path of each node, where known
+        """
+        with self.conn:
+            self.conn.execute('DELETE FROM scores')
+            self.conn.executemany(
+                'INSERT INTO scores (node, path, score) VALUES (?, ?, ?)',
+                ((node, paths.get(node), score) for node, score in scores.items()))
+
+    def top_scores(self, limit: int = 10) -> List[Tuple[str, Optional[str], float]]:
+        """(node, path, score) of the highest-scored nodes."""
+        return self.conn.execute(
+            'SELECT node, path, score FROM scores ORDER BY score DESC LIMIT ?', (limit,)).fetchall()
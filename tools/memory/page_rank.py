@@ -3,6 +3,18 @@ import networkx as nx
 from pathlib import Path
 from operator import itemgetter
 import re
+import copy
+from collections import Counter
+from tools.memory.references import scan_references as scan_references_in_files
+from tools.memory.symbols import extract_symbol_name
+from tools.memory.index_store import INDEX_FILE, RepoIndex
+from tools.memory.sparse_rank import SPARSE_AVAILABLE, SparsePageRank
+from tools.memory.symbol_table import SymbolTable
+from tools.content_cache import read_text
+
+IDENTIFIER_RE = re.compile(r'\w+')
+# Words that may name a file, e.g. `page_rank.py` or `tools/dir/writing.py`
+PATH_LIKE_RE = re.compile(r'[\w./\\-]+')
 
 class CodeDependencyGraphGenerator:
     def __init__(self):
@@ -16,11 +28,29 @@ class CodeDependencyGraphGenerator:
             'server.js': '#99FFFF'
         }
         self.pagerank_scores = {}
+        # Nodes are integer IDs of (path, symbol name) pairs
+        self.symbols = SymbolTable()
+        # File names and stems -> nodes, for seeding query rankings
+        self.file_nodes = {}
+        self.symbol_entries = []
+        self.name_index = {}
+        self.phrase_index = {}
+        self.name_lengths = []
+        self.phrase_lengths = []
+        # State kept from generate_graph() so update() can patch the graph
+        self.data = {}
+        self.references = None
+        self.file_entries = {}
+        self.map_path = None
+        self.repo_path = None
+        self.max_targets = 10
+        # CSR snapshot of the graph for PageRank, rebuilt whenever the graph
+        # changes; None without numpy/scipy, then nx.pagerank is used
+        self.rank_engine = None
         
     def parse_json_file(self, json_path):
         """Load and parse the JSON file containing code symbols."""
-        with open(json_path, 'r') as f:
-            return json.load(f)
+        return json.loads(read_text(json_path))
             
     def extract_file_name(self, path):
         """Extract the base file name from a path."""
@@ -28,28 +58,7 @@ class CodeDependencyGraphGenerator:
 
     def extract_symbol_name(self, code_line):
         """Extract symbol name from a code line."""
-        patterns = [
-            (r'class\s+(\w+)', 'class'),
-            (r'function\s+(\w+)', 'method'),
-            (r'def\s+(\w+)', 'method'),
-            (r'(\w+)\s*\([^)]*\)\s*{', 'method'),
-            (r'(\w+)\s*=\s*(?:async\s+)?\([^)]*\)\s*=>', 'method'),
-            (r'type\s+(\w+)', 'class'),
-            (r'interface\s+(\w+)', 'class'),
-            (r'struct\s+(\w+)', 'class'),
-        ]
-        
-        for pattern, symbol_type in patterns:
-            match = re.search(pattern, code_line)
-            if match:
-                name = match.group(1)
-                if 'constructor' in code_line:
-                    name = 'constructor'
-                elif 'async' in code_line:
-                    name = name.split()[-1]
-                return name, symbol_type
-        
-        return code_line.split('(')[0].strip(), 'method'
+        return extract_symbol_name(code_line)
         
     def add_nodes_from_data(self, data):
         """Add nodes to the graph from the parsed data."""
@@ -59,36 +68,472 @@ class CodeDependencyGraphGenerator:
             
             for symbol in file_data['symbols']:
                 symbol_name, symbol_type = self.extract_symbol_name(symbol)
-                node_id = f"{file_name}:{symbol_name}"
+                node_id = self.symbols.node(file_path, symbol_name)
                 
                 self.graph.add_node(node_id, 
                                   color=color, 
                                   type=symbol_type,
-                                  file=file_name)
+                                  file=file_name,
+                                  path=file_path)
+                self.file_nodes.setdefault(file_name, set()).add(node_id)
+                self.file_nodes.setdefault(Path(file_name).stem, set()).add(node_id)
                 
-    def add_edges_from_code_analysis(self, data):
-        """Add edges based on method calls and relationships."""
+    def build_symbol_index(self, data):
+        """
+        Extract every symbol name once and index it for reference lookups.
+        
+        Names that are a single identifier go into `name_index`; the rest
+        (fallback names such as 'pub fn render') are keyed by their identifier
+        tokens in `phrase_index`.
+        """
+        self.file_entries = {}
         for file_path, file_data in data.items():
-            file_name = self.extract_file_name(file_path)
+            self.file_entries[file_path] = self._file_entries(file_path, file_data['symbols'])
+        self._rebuild_indexes()
+        
+    def _file_entries(self, file_path, symbols):
+        """(position, symbol line, symbol name, node id) for each symbol of a file."""
+        entries = []
+        for position, symbol in enumerate(symbols):
+            symbol_name, _ = self.extract_symbol_name(symbol)
+            entries.append((position, symbol, symbol_name, self.symbols.node(file_path, symbol_name)))
+        return entries
+        
+    def _rebuild_indexes(self):
+        """Derive the symbol list and the lookup indexes from `file_entries`."""
+        self.symbol_entries = []
+        self.name_index = {}
+        self.phrase_index = {}
+        
+        for file_path, entries in self.file_entries.items():
+            for position, symbol, symbol_name, node_id in entries:
+                self.symbol_entries.append((file_path, position, symbol, symbol_name, node_id))
+                
+                if node_id not in self.graph:
+                    continue
+                if IDENTIFIER_RE.fullmatch(symbol_name):
+                    self.name_index.setdefault(symbol_name, set()).add(node_id)
+                else:
+                    key = tuple(IDENTIFIER_RE.findall(symbol_name))
+                    if key:
+                        self.phrase_index.setdefault(key, {}).setdefault(symbol_name, set()).add(node_id)
+        
+        self.name_lengths = sorted({len(name) for name in self.name_index})
+        self.phrase_lengths = sorted({len(key) for key in self.phrase_index})
+        
+    def names_in_line(self, line, name_index=None, phrase_index=None):
+        """
+        Yield (name, nodes) for every indexed name occurring in a line.
+        
+        An identifier name can only occur inside a single identifier token of
+        the line, so only substrings of the line's tokens are looked up; the
+        cost grows with the number and length of tokens, not with the number
+        of indexed names. Other indexes of the same shape can be passed in to
+        look for a subset of the names.
+        """
+        if name_index is None:
+            name_index, name_lengths = self.name_index, self.name_lengths
+            phrase_index, phrase_lengths = self.phrase_index, self.phrase_lengths
+        else:
+            phrase_index = phrase_index or {}
+            name_lengths = sorted({len(name) for name in name_index})
+            phrase_lengths = sorted({len(key) for key in phrase_index})
+        tokens = IDENTIFIER_RE.findall(line)
+        seen = set()
+        
+        for token in set(tokens):
+            token_length = len(token)
+            for length in name_lengths:
+                if length > token_length:
+                    break
+                for start in range(token_length - length + 1):
+                    name = token[start:start + length]
+                    if name in name_index and name not in seen:
+                        seen.add(name)
+                        yield name, name_index[name]
+        
+        if not phrase_index:
+            return
+        for i in range(len(tokens)):
+            for length in phrase_lengths:
+                key = tuple(tokens[i:i + length])
+                if len(key) < length:
+                    break
+                for name, nodes in phrase_index.get(key, {}).items():
+                    # Punctuation between the tokens has to match as well
+                    if name not in seen and name in line:
+                        seen.add(name)
+                        yield name, nodes
+                
+    def add_edges_from_code_analysis(self, data):
+        """
+        Add edges based on method calls and relationships.
+        
+        Symbol names are looked up through an index built once, so the cost
+        grows with the number of tokens in the symbol lines rather than with
+        the number of symbol pairs. Expects add_nodes_from_data() to have been
+        called with the same data.
+        """
+        self.build_symbol_index(data)
+        
+        targets_by_source = {}
+        for _, _, symbol, source_name, source_node in self.symbol_entries:
+            if source_node not in self.graph:
+                continue
             
-            for symbol in file_data['symbols']:
-                source_name, _ = self.extract_symbol_name(symbol)
-                source_node = f"{file_name}:{source_name}"
+            targets = targets_by_source.setdefault(source_node, set())
+            for other_name, target_nodes in self.names_in_line(symbol):
+                if other_name != source_name:
+                    targets |= target_nodes
+        
+        for source_node, targets in targets_by_source.items():
+            targets.discard(source_node)
+            self.graph.add_edges_from((source_node, target_node) for target_node in targets)
+
+    def add_edges_from_references(self, data, references, max_targets=10):
+        """
+        Add weighted edges for references found in symbol bodies.
+        
+        A reference is attributed to the nearest definition above it. When the
+        referenced name is defined in the same file that definition is the
+        target; otherwise the weight is split across every node with the name,
+        unless there are more than `max_targets` of them.
+        
+        Args:
+            data: Parsed repo_map.json
+            references: Output of tools.memory.references.scan_references
+            max_targets: Skip references to names defined in more places than this
+        """
+        self.max_targets = max_targets
+        for file_path, file_references in references.items():
+            symbols = data[file_path]['symbols']
+            
+            for owner, counts in file_references.items():
+                if owner is None:
+                    continue
+                source_name, _ = self.extract_symbol_name(symbols[owner])
+                source_node = self.symbols.find_node(file_path, source_name)
+                if source_node not in self.graph:
+                    continue
                 
-                for other_file, other_data in data.items():
-                    other_file_name = self.extract_file_name(other_file)
-                    
-                    for other_symbol in other_data['symbols']:
-                        other_name, _ = self.extract_symbol_name(other_symbol)
-                        
-                        if other_name in symbol and other_name != source_name:
-                            target_node = f"{other_file_name}:{other_name}"
-                            if source_node != target_node and source_node in self.graph and target_node in self.graph:
-                                self.graph.add_edge(source_node, target_node)
+                for target_node, weight in self._reference_weights(file_path, source_name, counts).items():
+                    if target_node == source_node:
+                        continue
+                    edge = self.graph.get_edge_data(source_node, target_node)
+                    if edge is None:
+                        self.graph.add_edge(source_node, target_node, weight=weight)
+                    else:
+                        edge['weight'] = edge.get('weight', 1) + weight
 
+    def _reference_weights(self, file_path, source_name, counts):
+        """Split the reference counts of one definition over the nodes they point at."""
+        weights = {}
+        for name, count in counts.items():
+            target_nodes = self.name_index.get(name)
+            if not target_nodes or name == source_name:
+                continue
+            local_node = self.symbols.find_node(file_path, name)
+            if local_node in target_nodes:
+                target_nodes = (local_node,)
+            elif len(target_nodes) > self.max_targets:
+                # Too ambiguous to say which definition is meant
+                continue
+            weight = count / len(target_nodes)
+            for target_node in target_nodes:
+                weights[target_node] = weights.get(target_node, 0) + weight
+        return weights
+
+    def save_scores(self):
+        """Store the current PageRank scores in the repository index."""
+        with RepoIndex(self.map_path) as index:
+            scores = {self.symbols.label(node): score for node, score in self.pagerank_scores.items()}
+            paths = {self.symbols.label(node): self.symbols.node_path(node) for node in self.pagerank_scores}
+            index.save_scores(scores, paths)
+            
+    def copy(self):
+        """
+        Copy the generator so that update() on the copy leaves this one intact.
+        
+        update() replaces the per-file values it changes instead of mutating
+        them, so only the graph and the top-level containers are copied. The
+        symbol table is shared: it only ever grows, and IDs never change.
+        """
+        clone = copy.copy(self)
+        clone.graph = self.graph.copy()
+        clone.data = dict(self.data)
+        clone.references = None if self.references is None else dict(self.references)
+        clone.file_entries = dict(self.file_entries)
+        clone.file_nodes = {key: set(nodes) for key, nodes in self.file_nodes.items()}
+        return clone
+        
+    def _defined_names(self):
+        """Every indexed name, identifier or not, with the nodes defining it."""
+        names = dict(self.name_index)
+        for phrases in self.phrase_index.values():
+            names.update(phrases)
+        return names
+        
+    def _source_edges(self, source_node):
+        """
+        Out-edges of a node as generate_graph() builds them: 1 for a name in
+        its definition line plus the reference weights from its body.
+        """
+        targets = set()
+        weights = {}
+        file_path = self.symbols.node_path(source_node)
+        file_references = (self.references or {}).get(file_path, {})
+        for position, symbol, symbol_name, node_id in self.file_entries.get(file_path, ()):
+            if node_id != source_node:
+                continue
+            for other_name, target_nodes in self.names_in_line(symbol):
+                if other_name != symbol_name:
+                    targets |= target_nodes
+            counts = file_references.get(position)
+            if counts:
+                for target_node, weight in self._reference_weights(file_path, symbol_name, counts).items():
+                    weights[target_node] = weights.get(target_node, 0) + weight
+        
+        targets.discard(source_node)
+        weights.pop(source_node, None)
+        edges = []
+        for target_node in targets:
+            if target_node in weights:
+                edges.append((source_node, target_node, {'weight': 1 + weights.pop(target_node)}))
+            else:
+                edges.append((source_node, target_node, {}))
+        edges.extend((source_node, target_node, {'weight': weight}) for target_node, weight in weights.items())
+        return edges
+        
+    def update(self, changed_files, removed_files=(), data=None, tol=1.0e-6):
+        """
+        Patch the graph for files that changed since generate_graph().
+        
+        Only the nodes of the given files are removed and re-added; out-edges
+        are recomputed for those nodes and for the nodes whose definition line
+        or body mentions a name whose definitions changed. PageRank then
+        restarts from the previous scores, which are already close to the new
+        fixed point, so it converges in a few iterations to within `tol` of a
+        full rebuild.
+        
+        Args:
+            changed_files: Added or modified paths, relative to the repository
+            removed_files: Deleted paths
+            data: Map data holding the changed files; read from the index when
+                not given
+            tol: PageRank error tolerance, as in nx.pagerank
+        """
+        changed_files = list(dict.fromkeys(changed_files))
+        removed_files = [path for path in removed_files if path not in changed_files]
+        affected = set(changed_files) | set(removed_files)
+        if not affected:
+            return self.pagerank_scores
+        
+        if data is None:
+            with RepoIndex(self.map_path) as index:
+                new_symbols = {path: index.symbols_for(path) for path in changed_files}
+        else:
+            new_symbols = {path: data[path]['symbols'] if path in data else [] for path in changed_files}
+        
+        old_names = self._defined_names()
+        old_nodes = {
+            node_id for path in affected
+            for _, _, _, node_id in self.file_entries.get(path, ())
+        }
+        
+        for path in affected:
+            self.data.pop(path, None)
+            self.file_entries.pop(path, None)
+        for path in changed_files:
+            if new_symbols[path]:
+                self.data[path] = {'path': path, 'symbols': new_symbols[path]}
+                self.file_entries[path] = self._file_entries(path, new_symbols[path])
+        
+        new_nodes = set()
+        for path in changed_files:
+            file_name = self.extract_file_name(path)
+            color = self.file_colors.get(file_name, '#CCCCCC')
+            for symbol in new_symbols[path]:
+                symbol_name, symbol_type = self.extract_symbol_name(symbol)
+                node_id = self.symbols.node(path, symbol_name)
+                new_nodes.add(node_id)
+                # Updates the attributes of a node that already exists
+                self.graph.add_node(node_id, color=color, type=symbol_type, file=file_name, path=path)
+        
+        # Nodes still defined keep their place and their in-edges
+        self.graph.remove_nodes_from(old_nodes - new_nodes)
+        
+        self._rebuild_indexes()
+        self.file_nodes = {}
+        for node_id, attrs in self.graph.nodes(data=True):
+            file_name = attrs['file']
+            self.file_nodes.setdefault(file_name, set()).add(node_id)
+            self.file_nodes.setdefault(Path(file_name).stem, set()).add(node_id)
+        
+        # Names gaining or losing a definition change the edges of every node
+        # that mentions them; edges to removed nodes already went with them
+        new_names = self._defined_names()
+        dirty_names = {
+            name for name in old_names.keys() | new_names.keys()
+            if old_names.get(name) != new_names.get(name)
+        }
+        
+        if self.references is not None:
+            scanner_names = self.name_index.keys()
+            changed_data = {path: self.data[path] for path in changed_files if path in self.data}
+            for path in affected:
+                self.references.pop(path, None)
+            self.references.update(scan_references_in_files(self.repo_path, changed_data, scanner_names))
+            
+            # Unchanged files were only scanned for names defined back then
+            unscanned = {name for name in self.name_index if name not in old_names}
+            if unscanned:
+                others = {path: file_data for path, file_data in self.data.items() if path not in affected}
+                rescanned = scan_references_in_files(self.repo_path, others, unscanned)
+                for path in others:
+                    merged = {}
+                    for owner, counts in self.references.get(path, {}).items():
+                        counts = Counter({name: count for name, count in counts.items() if name not in unscanned})
+                        if counts:
+                            merged[owner] = counts
+                    for owner, counts in rescanned.get(path, {}).items():
+                        merged[owner] = merged.get(owner, Counter()) + counts
+                    if merged:
+                        self.references[path] = merged
+                    else:
+                        self.references.pop(path, None)
+        
+        dirty = {node_id for node_id in old_nodes | new_nodes if node_id in self.graph}
+        if dirty_names:
+            dirty_index = {name: nodes for name, nodes in self.name_index.items() if name in dirty_names}
+            dirty_phrases = {}
+            for key, phrases in self.phrase_index.items():
+                for name, nodes in phrases.items():
+                    if name in dirty_names:
+                        dirty_phrases.setdefault(key, {})[name] = nodes
+            
+            for path, entries in self.file_entries.items():
+                if path in affected:
+                    continue
+                file_references = (self.references or {}).get(path, {})
+                for position, symbol, symbol_name, node_id in entries:
+                    if node_id in dirty or node_id not in self.graph:
+                        continue
+                    counts = file_references.get(position)
+                    if counts and any(name in dirty_names for name in counts):
+                        dirty.add(node_id)
+                    elif any(name != symbol_name for name, _ in self.names_in_line(symbol, dirty_index, dirty_phrases)):
+                        dirty.add(node_id)
+        
+        for node_id in dirty:
+            self.graph.remove_edges_from(list(self.graph.out_edges(node_id)))
+            self.graph.add_edges_from(self._source_edges(node_id))
+        
+        nstart = {node: self.pagerank_scores[node] for node in self.graph if node in self.pagerank_scores}
+        self.rank_engine = SparsePageRank.from_graph(self.graph) if SPARSE_AVAILABLE else None
+        try:
+            self.pagerank_scores = self.pagerank(nstart=nstart or None, tol=tol)
+        except nx.PowerIterationFailedConvergence:
+            self.calculate_pagerank()
+        
+        if self.map_path and Path(self.map_path).name == INDEX_FILE:
+            self.save_scores()
+        return self.pagerank_scores
+        
+    def pagerank(self, **kwargs):
+        """nx.pagerank on the current graph, through the sparse engine when available."""
+        if self.rank_engine is not None:
+            return self.rank_engine.pagerank(**kwargs)
+        return nx.pagerank(self.graph, **kwargs)
+        
     def calculate_pagerank(self):
         """Calculate PageRank scores for all nodes."""
-        self.pagerank_scores = nx.pagerank(self.graph)
+        self.rank_engine = SparsePageRank.from_graph(self.graph) if SPARSE_AVAILABLE else None
+        self.pagerank_scores = self.pagerank()
+        
+    def seed_nodes(self, text):
+        """
+        Weight the nodes a piece of text points at: symbols whose name appears
+        as an identifier, and every symbol of a file mentioned by name, path
+        or stem.
+        """
+        seeds = {}
+        
+        for token in set(IDENTIFIER_RE.findall(text)):
+            for node in self.name_index.get(token, ()):
+                seeds[node] = seeds.get(node, 0) + 1
+        
+        for word in set(PATH_LIKE_RE.findall(text)):
+            file_name = word.replace('\\', '/').rstrip('/').split('/')[-1]
+            for node in self.file_nodes.get(file_name, ()):
+                seeds[node] = seeds.get(node, 0) + 1
+        
+        return seeds
+        
+    def rank_for_query(self, prompt, context=None, context_weight=0.5, alpha=0.85):
+        """
+        Personalized PageRank seeded by what the prompt (and, with less
+        weight, the recent chat context) mentions.
+        
+        The already-built graph and its sparse matrix are reused and the
+        iteration starts from the global scores, so a turn costs a few power
+        iterations instead of a full recompute. Falls back to the global
+        ranking when nothing in the text matches a node.
+        
+        Args:
+            prompt: The user's prompt
+            context: Recent message contents
+            context_weight: Weight of context seeds relative to prompt seeds
+            alpha: Damping factor
+            
+        Returns:
+            Dict mapping node to score
+        """
+        personalization = self.seed_nodes(prompt)
+        for text in context or []:
+            for node, weight in self.seed_nodes(text).items():
+                personalization[node] = personalization.get(node, 0) + context_weight * weight
+        
+        if not personalization:
+            return self.pagerank_scores
+        
+        try:
+            return self.pagerank(alpha=alpha, personalization=personalization,
+                                 nstart=self.pagerank_scores or None)
+        except nx.PowerIterationFailedConvergence:
+            return self.pagerank_scores
+        
+    def ranked_symbols(self, scores=None):
+        """
+        List every symbol line with the score of its node, highest first.
+        
+        Args:
+            scores: Node scores, defaults to the global PageRank
+            
+        Returns:
+            List of (path, position in file, symbol line, score) tuples
+        """
+        scores = self.pagerank_scores if scores is None else scores
+        ranked = [
+            (file_path, position, symbol, scores.get(node_id, 0))
+            for file_path, position, symbol, _, node_id in self.symbol_entries
+        ]
+        ranked.sort(key=itemgetter(3), reverse=True)
+        return ranked
+        
+    def file_scores(self, scores=None):
+        """
+        Sum node scores per file path, highest first.
+        
+        Args:
+            scores: Node scores, defaults to the global PageRank
+        """
+        scores = self.pagerank_scores if scores is None else scores
+        totals = {}
+        for node, score in scores.items():
+            path = self.graph.nodes[node].get('path')
+            if path is not None:
+                totals[path] = totals.get(path, 0) + score
+        return dict(sorted(totals.items(), key=itemgetter(1), reverse=True))
         
     def generate_concise_json(self, original_data, output_dir, top_percentage=30):
         """Generate a new JSON containing only the most important functions based on PageRank."""
@@ -98,32 +543,29 @@ class CodeDependencyGraphGenerator:
         top_nodes = sorted_nodes[:int(num_nodes * top_percentage / 100)]
         
         concise_data = {}
+        # First symbol line of each node, in file order
+        node_symbols = {}
+        for file_path, _, symbol, _, node_id in self.symbol_entries:
+            node_symbols.setdefault(node_id, symbol)
         
         for node, score in top_nodes:
-            file_name, symbol_name = node.split(':')
+            original_file_path = self.symbols.node_path(node)
+            if original_file_path not in original_data:
+                continue
             
-            original_file_path = None
-            for path in original_data.keys():
-                if Path(path).name == file_name:
-                    original_file_path = path
-                    break
-                    
-            if original_file_path:
-                if original_file_path not in concise_data:
-                    concise_data[original_file_path] = {
-                        "path": original_file_path,
-                        "symbols": [],
-                        "pagerank_score": score
-                    }
-                
-                for symbol in original_data[original_file_path]["symbols"]:
-                    symbol_found_name, _ = self.extract_symbol_name(symbol)
-                    if symbol_found_name == symbol_name:
-                        concise_data[original_file_path]["symbols"].append({
-                            "code": symbol,
-                            "pagerank_score": score
-                        })
-                        break
+            if original_file_path not in concise_data:
+                concise_data[original_file_path] = {
+                    "path": original_file_path,
+                    "symbols": [],
+                    "pagerank_score": score
+                }
+            
+            symbol = node_symbols.get(node)
+            if symbol is not None:
+                concise_data[original_file_path]["symbols"].append({
+                    "code": symbol,
+                    "pagerank_score": score
+                })
         
         # Save the concise JSON in the input directory
         output_path = Path(output_dir) / 'concise.json'
@@ -132,18 +574,50 @@ class CodeDependencyGraphGenerator:
             
         return concise_data
     
-    def generate_graph(self, json_path):
-        """Generate the dependency graph and analyze it."""
-        data = self.parse_json_file(json_path)
-        input_dir = str(Path(json_path).parent)
+    def load_repo_map(self, map_path):
+        """Load repo map data from .lagrange/index.db or a repo_map.json export."""
+        if Path(map_path).name == INDEX_FILE:
+            with RepoIndex(map_path) as index:
+                return index.as_dict()
+        return self.parse_json_file(map_path)
+        
+    def generate_graph(self, map_path, scan_references=False, repo_path=None, export_json=None, verbose=True):
+        """
+        Generate the dependency graph and analyze it.
+        
+        Args:
+            map_path: Path to .lagrange/index.db, or to a repo_map.json export
+            scan_references: Also scan file bodies for references to defined
+                symbols and add them as weighted edges
+            repo_path: Repository root, defaults to the parent of the map's directory
+            export_json: Write concise.json next to the map; defaults to doing
+                so only for a JSON map, an index stores the scores instead
+            verbose: Print graph statistics and the top ranked functions
+        """
+        data = self.load_repo_map(map_path)
+        input_dir = str(Path(map_path).parent)
+        self.data = data
+        self.map_path = map_path
+        self.repo_path = repo_path or str(Path(map_path).parent.parent)
         
         self.add_nodes_from_data(data)
         self.add_edges_from_code_analysis(data)
         
+        self.references = None
+        if scan_references:
+            self.references = scan_references_in_files(self.repo_path, data, self.name_index)
+            self.add_edges_from_references(data, self.references)
+        
         self.calculate_pagerank()
         
-        self.generate_concise_json(data, input_dir)
+        from_index = Path(map_path).name == INDEX_FILE
+        if from_index:
+            self.save_scores()
+        if export_json or (export_json is None and not from_index):
+            self.generate_concise_json(data, input_dir)
         
+        if not verbose:
+            return
         print("\nGraph Statistics:")
         print(f"Number of nodes: {self.graph.number_of_nodes()}")
         print(f"Number of edges: {self.graph.number_of_edges()}")
@@ -152,8 +626,8 @@ class CodeDependencyGraphGenerator:
         print("\nTop 10 Most Important Functions (by PageRank):")
         top_functions = sorted(self.pagerank_scores.items(), key=itemgetter(1), reverse=True)[:10]
         for node, score in top_functions:
-            print(f"{node}: {score:.3f}")
+            print(f"{self.symbols.label(node)}: {score:.3f}")
 """Usage Example:
 generator = CodeDependencyGraphGenerator()
-generator.generate_graph("D:/experiment_lagrange/OpenHands/.codemap/repo_map.json")
+generator.generate_graph("D:/experiment_lagrange/OpenHands/.lagrange/index.db")
 """
\ No newline at end of file
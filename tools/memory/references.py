@@ -0,0 +1,92 @@
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from tools.content_cache import read_text
+
+IDENTIFIER_RE = re.compile(r'\w+')
+
+
+class ReferenceScanner:
+    """
+    Find references to a fixed set of symbol names in file contents.
+
+    Every name is a whole identifier, so instead of a character-level
+    automaton the scanner tokenizes the buffer with one compiled regex and
+    checks each token against a hash set. That is the same single linear
+    pass an Aho-Corasick matcher makes, but runs in C, and it never reports
+    a name inside a longer identifier.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names = frozenset(name for name in names if IDENTIFIER_RE.fullmatch(name))
+
+    def scan_content(self, content: str, symbol_lines: List[str]) -> Dict[Optional[int], Counter]:
+        """
+        Count the references in one file, grouped by enclosing definition.
+
+        Args:
+            content: File contents
+            symbol_lines: The file's symbol lines from the repo map, in file order
+
+        Returns:
+            Dict mapping the index of the nearest definition above each
+            reference (None before the first one) to a Counter of names
+        """
+        # Locate each definition line, searching forward from the previous one
+        starts = []
+        indexes = []
+        pos = 0
+        for index, line in enumerate(symbol_lines):
+            found = content.find(line, pos)
+            if found == -1:
+                continue
+            starts.append(found)
+            indexes.append(index)
+            pos = found + len(line)
+
+        names = self.names
+        references: Dict[Optional[int], Counter] = {}
+        bounds = [0] + starts + [len(content)]
+        owners = [None] + indexes
+        for owner, start, end in zip(owners, bounds, bounds[1:]):
+            # Tokenizing, counting and intersecting with the names all run in C
+            tokens = Counter(IDENTIFIER_RE.findall(content, start, end))
+            found = names.intersection(tokens)
+            if found:
+                counts = references.setdefault(owner, Counter())
+                for name in found:
+                    counts[name] += tokens[name]
+        return references
+
+    def scan_file(self, file_path: str, symbol_lines: List[str]) -> Dict[Optional[int], Counter]:
+        try:
+            content = read_text(file_path, errors='replace')
+        except OSError as e:
+            print(f"Warning: Could not scan {file_path}: {e}")
+            return {}
+        return self.scan_content(content, symbol_lines)
+
+
+def scan_references(repo_path: str, data: dict, names: Iterable[str]) -> Dict[str, Dict[Optional[int], Counter]]:
+    """
+    Stream every mapped file once and record which defined names it references.
+
+    Args:
+        repo_path (str): Root of the repository the map was built from
+        data (dict): Parsed repo_map.json
+        names (iterable): Defined symbol names to look for
+
+    Returns:
+        Dict mapping each file path to its references, see ReferenceScanner.scan_content
+    """
+    root = Path(repo_path)
+    scanner = ReferenceScanner(names)
+
+    references = {}
+    for file_path, file_data in data.items():
+        file_references = scanner.scan_file(str(root / file_path), file_data['symbols'])
+        if file_references:
+            references[file_path] = file_references
+    return references
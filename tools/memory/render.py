@@ -0,0 +1,87 @@
+from typing import Callable, Iterable, List, Optional, Tuple
+
+DEFAULT_TOKEN_BUDGET = 4096
+# Symbol lines longer than this are cut, they rarely add anything useful
+MAX_LINE_LENGTH = 120
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate of roughly four characters per token."""
+    return (len(text) + 3) // 4
+
+
+def render_tree(items: Iterable[Tuple[str, int, Optional[str]]]) -> str:
+    """
+    Render (path, position, symbol line) entries as a compact indented tree.
+
+    Files are grouped under their directories and listed by path, with
+    their symbols in position order; a symbol of None lists the file
+    without symbols.
+    """
+    files = {}
+    for path, position, symbol in items:
+        symbols = files.setdefault(path.replace('\\', '/'), [])
+        if symbol is not None:
+            symbols.append((position, symbol))
+
+    lines = []
+    current_dirs: List[str] = []
+    for path in sorted(files, key=lambda file_path: file_path.split('/')):
+        *dirs, file_name = path.split('/')
+
+        common = 0
+        while common < min(len(dirs), len(current_dirs)) and dirs[common] == current_dirs[common]:
+            common += 1
+        for depth in range(common, len(dirs)):
+            lines.append(f"{'  ' * depth}{dirs[depth]}/")
+        current_dirs = dirs
+
+        indent = '  ' * len(dirs)
+        symbols = sorted(files[path])
+        lines.append(f"{indent}{file_name}{':' if symbols else ''}")
+        for _, symbol in symbols:
+            symbol = symbol.strip()
+            if len(symbol) > MAX_LINE_LENGTH:
+                symbol = symbol[:MAX_LINE_LENGTH - 3] + '...'
+            lines.append(f"{indent}  {symbol}")
+
+    return '\n'.join(lines)
+
+
+def render_repo_map(ranked_symbols: List[Tuple[str, int, str, float]], all_files: Optional[List[str]] = None,
+                    token_budget: int = DEFAULT_TOKEN_BUDGET,
+                    count_tokens: Callable[[str], int] = estimate_tokens) -> str:
+    """
+    Render the highest-ranked part of the repo map that fits a token budget.
+
+    Entries are taken in rank order: symbols first, then the paths of any
+    remaining files. The number of entries is found by binary search, so
+    the tree is rendered O(log n) times whatever the repository size.
+
+    Args:
+        ranked_symbols: (path, position in file, symbol line, score) tuples,
+            highest score first
+        all_files: Every file in the repository, listed after the symbols
+        token_budget: Maximum size of the result in tokens
+        count_tokens: Tokenizer used to measure the rendered text
+
+    Returns:
+        str: The rendered tree, empty if not even one entry fits
+    """
+    items: List[Tuple[str, int, Optional[str]]] = [
+        (path, position, symbol) for path, position, symbol, _ in ranked_symbols
+    ]
+    mapped = {path for path, _, _ in items}
+    items.extend((path, 0, None) for path in all_files or [] if path not in mapped)
+
+    # Largest prefix of `items` whose rendering fits the budget
+    low, high = 0, len(items)
+    best = ''
+    while low < high:
+        mid = (low + high + 1) // 2
+        text = render_tree(items[:mid])
+        if count_tokens(text) <= token_budget:
+            low, best = mid, text
+        else:
+            high = mid - 1
+    return best
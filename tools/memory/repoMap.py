@@ -1,13 +1,34 @@
 import os
 import re
+import hashlib
 from pathlib import Path
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
 import json
+from tools.memory.traversal import FileEntry, walk_repository
+from tools.memory.index_store import RepoIndex
+from tools.content_cache import read_bytes, read_text
+
+# Bump whenever LanguageParser can return different symbols for the same
+# input, so manifest entries written by an older parser are re-parsed.
+PARSER_VERSION = 3
+
+REPO_MAP_FILE = 'repo_map.json'
+MANIFEST_FILE = 'manifest.json'
+
+# Optional groups and whitespace at the very start of a symbol pattern
+_OPTIONAL_PREFIX_RE = re.compile(r'^(?:\(\?:[^()]*\)\?|\\s\*)+')
+# An optional group between two runs of whitespace, e.g. \s*(?:const)?\s*
+_WS_OPTIONAL_RE = re.compile(r'\\s\*\(\?:([^()]*)\)\?(?=\\s\*)')
+# A line that closes the block of the definition above it
+_BLOCK_CLOSE_RE = re.compile(r'(?:[}\])]|end\b)')
 
 class FileMap:
-    def __init__(self, path: str, symbols: List[str]):
+    def __init__(self, path: str, symbols: List[str], spans: Optional[List[Tuple[int, int]]] = None):
         self.path = path
         self.symbols = symbols
+        # First and last line (1-based) of each symbol's definition, when known
+        self.spans = spans
 
     def __str__(self) -> str:
         output = [f"\n{self.path}:"]
@@ -90,6 +111,55 @@ class LanguageParser:
             'ruby': ['.rb']
         }
 
+        # Block comments stripped before scanning, applied in order
+        comment_patterns = {
+            'python': [('"""', r'"""[\s\S]*?"""'), ("'''", r"'''[\s\S]*?'''")],
+            'ruby': [('"""', r'"""[\s\S]*?"""'), ("'''", r"'''[\s\S]*?'''")],
+            'javascript': [('/*', r'/\*[\s\S]*?\*/')],
+            'java': [('/*', r'/\*[\s\S]*?\*/')],
+            'cpp': [('/*', r'/\*[\s\S]*?\*/')],
+            'rust': [('/*', r'/\*[\s\S]*?\*/')]
+        }
+        self.comment_res = {
+            lang: [(marker, re.compile(pattern)) for marker, pattern in entries]
+            for lang, entries in comment_patterns.items()
+        }
+        self.scanners = {
+            lang: self._compile_scanner(spec['symbols'])
+            for lang, spec in self.patterns.items()
+        }
+
+    @staticmethod
+    def _compile_scanner(patterns: List[str]) -> List[re.Pattern]:
+        r"""
+        Compile a language's symbol patterns for scanning a whole file buffer.
+
+        Only whether a line matches matters, never where, which allows a few
+        rewrites that leave the set of matching lines unchanged:
+
+        * whitespace and negated classes are narrowed so a match never
+          crosses a newline, and each match swallows the rest of its line;
+        * leading optional groups such as ``(?:export\s+)?`` are dropped, so
+          most patterns start with a literal the regex engine can seek to;
+        * ``\w+`` only starts at a word boundary, which avoids retrying every
+          suffix of long identifiers;
+        * ``\s*(?:const)?\s*`` becomes ``(?:\s*const)?\s*``, the same
+          language without the polynomial backtracking of adjacent ``\s*``.
+
+        Patterns are kept separate rather than joined into one alternation
+        because that would lose the literal-prefix search.
+        """
+        scanners = []
+        for pattern in patterns:
+            pattern = _OPTIONAL_PREFIX_RE.sub('', pattern)
+            pattern = _WS_OPTIONAL_RE.sub(r'(?:\\s*\1)?', pattern)
+            pattern = (pattern.replace(r'\s', r'[^\S\n]')
+                       .replace('[^)]', '[^)\\n]')
+                       .replace('[^>]', '[^>\\n]')
+                       .replace(r'\w+', r'(?<!\w)\w+'))
+            scanners.append(re.compile(rf'(?:{pattern})[^\n]*'))
+        return scanners
+
     def get_language(self, file_path: str) -> str:
         suffix = Path(file_path).suffix.lower()
         for lang, exts in self.extensions.items():
@@ -103,40 +173,157 @@ class LanguageParser:
             if not language:
                 return []
 
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Handle multi-line comments
-            if language in ['python', 'ruby']:
-                content = re.sub(r'"""[\s\S]*?"""', '', content)
-                content = re.sub(r"'''[\s\S]*?'''", '', content)
-            elif language in ['javascript', 'java', 'cpp', 'rust']:
-                content = re.sub(r'/\*[\s\S]*?\*/', '', content)
-            
-            lines = content.split('\n')
-            symbols = []
-            
-            for line in lines:
-                line = line.strip()
-                if not line or line.startswith(('//', '#', '--')):
-                    continue
-                
-                for pattern in self.patterns[language]['symbols']:
-                    match = re.search(pattern, line)
-                    if match:
-                        symbols.append(line)
-                        break
-            
-            return symbols
+            content = read_text(file_path)
+
+            return self.parse_content(content, language)
 
         except Exception as e:
             print(f"Warning: Could not parse {file_path}: {e}")
             return []
 
+    def parse_content(self, content: str, language: str) -> List[str]:
+        """Extract symbol lines from file content that has already been read."""
+        return [code for code, _, _ in self.parse_definitions(content, language)]
+
+    def parse_definitions(self, content: str, language: str) -> List[Tuple[str, int, int]]:
+        """
+        Extract (symbol line, first line, last line) of every definition, with
+        1-based line numbers.
+
+        A definition ends at its last line indented deeper than its header,
+        plus a closing line such as `}` or `end` at the header's indentation.
+        An opening `{` on its own line at that indentation starts a body that
+        runs to its matching `}`, whatever the indentation inside.
+        """
+        # Handle multi-line comments, keeping their newlines so that line
+        # numbers still match the file
+        for marker, comment_re in self.comment_res.get(language, ()):
+            if marker in content:
+                content = comment_re.sub(lambda match: '\n' * match.group().count('\n'), content)
+
+        # Sweep the buffer once per compiled pattern, then emit matching lines
+        # in file order
+        line_starts = set()
+        for symbol_re in self.scanners[language]:
+            for match in symbol_re.finditer(content):
+                line_starts.add(content.rfind('\n', 0, match.start()) + 1)
+
+        symbols = []
+        lines = None
+        line_number = 1
+        previous = 0
+        for start in sorted(line_starts):
+            end = content.find('\n', start)
+            line = content[start:end if end != -1 else None].strip()
+            line_number += content.count('\n', previous, start)
+            previous = start
+            if not line.startswith(('//', '#', '--')):
+                if lines is None:
+                    lines = content.split('\n')
+                symbols.append((line, line_number, _definition_end(lines, line_number - 1) + 1))
+
+        return symbols
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+def _definition_end(lines: List[str], index: int) -> int:
+    """Index of the last line of the definition whose header is lines[index]."""
+    indent = _indent(lines[index])
+    end = index
+    for i in range(index + 1, len(lines)):
+        stripped = lines[i].strip()
+        if not stripped:
+            continue
+        if _indent(lines[i]) <= indent:
+            if stripped.startswith(('#', '//')):
+                # Comments and preprocessor lines don't end a block
+                continue
+            if stripped.startswith('{') and end == index:
+                # Allman style: the body opens on its own line below the header
+                return _matching_brace(lines, i)
+            if _BLOCK_CLOSE_RE.match(stripped):
+                end = i
+            break
+        end = i
+    return end
+
+def _matching_brace(lines: List[str], index: int) -> int:
+    """Index of the line closing the brace opened on lines[index], by counting braces."""
+    depth = 0
+    for i in range(index, len(lines)):
+        stripped = lines[i].strip()
+        if stripped.startswith('//'):
+            continue
+        depth += stripped.count('{') - stripped.count('}')
+        if depth <= 0:
+            return i
+    return len(lines) - 1
+
+_worker_parser = None
+
+def _scan_file(parser: LanguageParser, item: tuple) -> tuple:
+    """
+    Read, hash and (if the hash changed) parse a single file.
+
+    Returns (rel_path, manifest entry, definitions) with definitions as
+    returned by parse_definitions(); the entry is None when the file could
+    not be read and definitions is None when the content hash matches the
+    previous manifest entry.
+    """
+    file_path, rel_path, language, size, mtime_ns, old_hash = item
+    try:
+        raw = read_bytes(file_path)
+    except OSError as e:
+        print(f"Warning: Could not parse {file_path}: {e}")
+        return rel_path, None, None
+
+    digest = hashlib.sha1(raw).hexdigest()
+    entry = {
+        'size': size,
+        'mtime_ns': mtime_ns,
+        'hash': digest,
+        'parser_version': PARSER_VERSION
+    }
+    if digest == old_hash:
+        # Touched but not modified
+        return rel_path, entry, None
+
+    try:
+        content = raw.decode('utf-8')
+    except UnicodeDecodeError as e:
+        print(f"Warning: Could not parse {file_path}: {e}")
+        return rel_path, entry, []
+    # Match the universal-newline translation that text-mode open() applies
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return rel_path, entry, parser.parse_definitions(content, language)
+
+def _scan_batch(batch: List[tuple]) -> List[tuple]:
+    """Process pool entry point: scan a chunk of files with a per-process parser."""
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = LanguageParser()
+    return [_scan_file(_worker_parser, item) for item in batch]
+
 class RepoMapper:
-    def __init__(self, repo_path: str):
+    def __init__(self, repo_path: str, workers: Optional[int] = None,
+                 chunk_size: Optional[int] = None, parallel_threshold: int = 256):
+        """
+        Args:
+            repo_path (str): Path to the repository to be mapped
+            workers (int, optional): Parser processes to use; defaults to the CPU
+                count, and 1 disables the process pool
+            chunk_size (int, optional): Files sent to a worker per batch; by
+                default sized so each worker receives about four batches
+            parallel_threshold (int): Below this many files to parse, parsing
+                stays serial because pool startup would dominate
+        """
         self.repo_path = Path(repo_path).resolve()
         self.parser = LanguageParser()
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.parallel_threshold = parallel_threshold
 
     def _should_ignore(self, path: str) -> bool:
         ignore_patterns = {
@@ -149,53 +336,262 @@ class RepoMapper:
         path_parts = Path(path).parts
         return any(part in ignore_patterns for part in path_parts)
 
-    def generate_map(self) -> Dict[str, FileMap]:
-        repo_map = {}
+    def _iter_files(self, entries: Optional[List[FileEntry]] = None):
+        """
+        Yield the traversal entries the mapper should consider. `entries` from
+        an earlier walk_repository() call are reused instead of walking again.
+        """
+        if entries is None:
+            entries = walk_repository(str(self.repo_path))
+
+        for entry in entries:
+            # Relative, so that a repository checked out under e.g. ~/build
+            # is not ignored wholesale
+            if not self._should_ignore(entry.rel_path):
+                yield entry
+
+    def generate_map(self, entries: Optional[List[FileEntry]] = None) -> Dict[str, FileMap]:
+        return self.update_map({}, {}, entries)[0]
+
+    def _scan(self, work: List[tuple]) -> List[tuple]:
+        """Scan work items, fanning out to a process pool for large batches."""
+        if self.workers <= 1 or len(work) < self.parallel_threshold:
+            return [_scan_file(self.parser, item) for item in work]
+
+        workers = min(self.workers, len(work))
+        chunk_size = self.chunk_size or max(1, -(-len(work) // (workers * 4)))
+        chunks = [work[i:i + chunk_size] for i in range(0, len(work), chunk_size)]
+
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map() yields in submission order, which keeps the output deterministic
+            for batch in executor.map(_scan_batch, chunks):
+                results.extend(batch)
+        return results
+
+    def update_map(self, previous_map: Dict[str, FileMap], manifest: Dict[str, dict],
+                   entries: Optional[List[FileEntry]] = None) -> Tuple[Dict[str, FileMap], Dict[str, dict], List[str]]:
+        """
+        Bring a previously generated map up to date, re-parsing only the files
+        whose manifest entry no longer matches what is on disk.
 
-        for root, _, files in os.walk(self.repo_path):
-            if self._should_ignore(root):
+        A file is reused without being opened when its size and mtime are
+        unchanged; otherwise it is read and hashed, and only re-parsed if the
+        content hash differs as well.
+
+        Args:
+            previous_map: Map produced by an earlier run
+            manifest: Manifest entries from that run, keyed by relative path
+            entries: Files from an earlier walk_repository() call, if any
+
+        Returns:
+            The updated map, the new manifest and the relative paths that were
+            added, changed or removed
+        """
+        order = []
+        reused = {}
+        work = []
+
+        for file_entry in self._iter_files(entries):
+            rel_path = file_entry.rel_path
+            language = self.parser.get_language(rel_path)
+            if not language:
+                continue
+
+            try:
+                stat = file_entry.stat()
+            except OSError:
                 continue
 
-            for file in files:
-                file_path = Path(root) / file
-                if self._should_ignore(file_path):
+            entry = manifest.get(rel_path)
+            if entry and entry.get('parser_version') != PARSER_VERSION:
+                entry = None
+
+            order.append(rel_path)
+            if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                reused[rel_path] = entry
+            else:
+                work.append((file_entry.path, rel_path, language, stat.st_size,
+                             stat.st_mtime_ns, entry['hash'] if entry else None))
+
+        scanned = {rel_path: (entry, symbols) for rel_path, entry, symbols in self._scan(work)}
+
+        repo_map = {}
+        new_manifest = {}
+        changed = []
+
+        for rel_path in order:
+            if rel_path in reused:
+                new_manifest[rel_path] = reused[rel_path]
+                symbols = None
+            else:
+                entry, symbols = scanned[rel_path]
+                if entry is None:
                     continue
-                
-                rel_path = file_path.relative_to(self.repo_path)
-                symbols = self.parser.parse_file(str(file_path))
-                if symbols:
-                    repo_map[str(rel_path)] = FileMap(str(rel_path), symbols)
+                new_manifest[rel_path] = entry
+
+            if symbols is None:
+                if rel_path in previous_map:
+                    repo_map[rel_path] = previous_map[rel_path]
+                continue
+
+            if symbols:
+                repo_map[rel_path] = FileMap(rel_path, [code for code, _, _ in symbols],
+                                             [(first, last) for _, first, last in symbols])
+            changed.append(rel_path)
+
+        changed.extend(path for path in manifest if path not in new_manifest)
+        return repo_map, new_manifest, changed
+
+def _load_previous_state(codemap_dir: Path) -> Tuple[Dict[str, FileMap], Dict[str, dict]]:
+    """
+    Load the map and manifest JSON written by older runs, or empty ones if unusable.
+
+    Files whose symbols were exported without line spans are left out of the
+    manifest, so they are parsed again instead of being stored without spans.
+    """
+    try:
+        with open(codemap_dir / REPO_MAP_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with open(codemap_dir / MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}, {}
 
-        return repo_map
+    previous_map = {}
+    for file_path, file_data in data.items():
+        spans = [tuple(span) for span in file_data.get('spans') or []]
+        previous_map[file_path] = FileMap(file_data['path'], file_data['symbols'],
+                                          spans if len(spans) == len(file_data['symbols']) else None)
+    manifest = {
+        file_path: entry for file_path, entry in manifest.items()
+        if file_path not in previous_map or previous_map[file_path].spans
+    }
+    return previous_map, manifest
 
-def map_repository(repo_path: str) -> None:
+def _write_json(path: Path, data, **kwargs) -> None:
+    """Write JSON through a temporary file so readers never see a partial file."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, **kwargs)
+    os.replace(tmp_path, path)
+
+def refresh_repository(repo_path: str, incremental: bool = True, workers: Optional[int] = None,
+                       entries: Optional[List[FileEntry]] = None,
+                       export_json: bool = False) -> Tuple[Dict[str, FileMap], List[str]]:
     """
-    Generate and save a repository map as JSON in the .lagrange directory.
+    Bring the repository map in .lagrange/index.db up to date, without output.
+
+    The index also holds a manifest of every parsed file (size, mtime, content
+    hash and parser version), so later runs only re-parse files that were
+    added, changed or deleted since, and only their rows are rewritten.
     
     Args:
         repo_path (str): Path to the repository to be mapped
+        incremental (bool): Reuse the previous map and manifest when present
+        workers (int, optional): Parser processes to use, see RepoMapper
+        entries (list, optional): Files from an earlier walk_repository() call
+        export_json (bool): Also write repo_map.json and manifest.json, for
+            tools that read the old format
+
+    Returns:
+        The up-to-date repository map and the relative paths that were added,
+        changed or removed
     """
     repo_path = Path(repo_path).resolve()
     codemap_dir = repo_path / '.lagrange'
-    codemap_dir.mkdir(exist_ok=True)
-    
-    mapper = RepoMapper(str(repo_path))
-    repo_map = mapper.generate_map()
-    
-    serializable_map = {}
-    for file_path, file_map in repo_map.items():
-        serializable_map[file_path] = {
-            'path': file_map.path,
-            'symbols': file_map.symbols
-        }
-    
-    output_path = codemap_dir / 'repo_map.json'
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(serializable_map, f, indent=2)
+
+    with RepoIndex.for_repository(str(repo_path)) as index:
+        if not incremental:
+            previous_map, manifest = {}, {}
+        elif index.is_empty():
+            # Carry over the state of a run that predates the index
+            previous_map, manifest = _load_previous_state(codemap_dir)
+        else:
+            manifest = index.manifest()
+            previous_map = {
+                file_path: FileMap(file_path, [code for code, _, _ in definitions],
+                                   [(first, last) for _, first, last in definitions])
+                for file_path, definitions in index.load_definitions().items()
+            }
+
+        mapper = RepoMapper(str(repo_path), workers=workers)
+        repo_map, new_manifest, changed = mapper.update_map(previous_map, manifest, entries)
+
+        migrating = incremental and bool(manifest) and index.is_empty()
+        if migrating:
+            updated = list(repo_map)
+            manifest_updates = new_manifest
+        else:
+            updated = [file_path for file_path in changed if file_path in new_manifest]
+            manifest_updates = {
+                file_path: entry for file_path, entry in new_manifest.items()
+                if manifest.get(file_path) != entry
+            }
+        symbols = {}
+        spans = {}
+        for file_path in updated:
+            file_map = repo_map.get(file_path)
+            symbols[file_path] = file_map.symbols if file_map else []
+            if file_map and file_map.spans:
+                spans[file_path] = file_map.spans
+        removed = [file_path for file_path in manifest if file_path not in new_manifest]
+        index.update(symbols, manifest_updates, removed, clear=not incremental, spans=spans)
+
+    if export_json:
+        if changed or not (codemap_dir / REPO_MAP_FILE).exists():
+            serializable_map = {}
+            for file_path, file_map in repo_map.items():
+                serializable_map[file_path] = {
+                    'path': file_map.path,
+                    'symbols': file_map.symbols,
+                    'spans': file_map.spans
+                }
+            _write_json(codemap_dir / REPO_MAP_FILE, serializable_map, indent=2)
+
+        if new_manifest != manifest or not (codemap_dir / MANIFEST_FILE).exists():
+            _write_json(codemap_dir / MANIFEST_FILE, new_manifest, separators=(',', ':'))
+
+    return repo_map, changed
+
+def map_repository(repo_path: str, incremental: bool = True, workers: Optional[int] = None,
+                   entries: Optional[List[FileEntry]] = None, export_json: bool = False) -> Dict[str, FileMap]:
+    """
+    Generate and save a repository map in .lagrange/index.db, printing the
+    maps of the files that changed. See refresh_repository for the arguments.
+
+    Returns:
+        Dict[str, FileMap]: The up-to-date repository map
+    """
+    repo_map, changed = refresh_repository(repo_path, incremental, workers, entries, export_json)
     
-    for file_map in repo_map.values():
-        print(file_map)
+    for file_path in changed:
+        if file_path in repo_map:
+            print(repo_map[file_path])
 
+    print(f"Mapped {len(repo_map)} files ({len(changed)} added, changed or removed)")
+    return repo_map
 
+# Test cases
+def run_tests() -> None:
+    """Run test cases for definition line spans"""
+    parser = LanguageParser()
+    cases = [
+        ('python', "def f(x):\n    return {\n        1: 2\n    }\n\ndef g():\n    pass\n",
+         [('def f(x):', 1, 4), ('def g():', 6, 7)]),
+        ('java', "public class A {\n  void b() {\n  }\n}\n",
+         [('public class A {', 1, 4), ('void b() {', 2, 3)]),
+        # Allman style: the opening brace is on its own line
+        ('java', "public class Foo\n{\n    public void bar()\n    {\n        x();\n    }\n\n    void empty()\n    {}\n}\n",
+         [('public class Foo', 1, 10), ('public void bar()', 3, 6), ('void empty()', 8, 9)]),
+        ('cpp', "namespace app\n{\nstruct Point\n{\n  int x;\n};\n}\n\nclass Foo\n{\n  int y;\n};\n",
+         [('namespace app', 1, 7), ('struct Point', 3, 6), ('class Foo', 9, 12)]),
+    ]
+    for language, content, expected in cases:
+        spans = parser.parse_definitions(content, language)
+        assert spans == expected, (language, spans)
+    print("All tests passed!")
 
 
+if __name__ == "__main__":
+    run_tests()
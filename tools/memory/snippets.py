@@ -0,0 +1,156 @@
+import mmap
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from tools.memory.index_store import RepoIndex
+from tools.content_cache import read_text
+
+# Lines kept above and below each relevant definition
+SNIPPET_CONTEXT_LINES = 3
+# A file without relevant definitions is sent whole up to this size, and as
+# an outline of its definitions above it
+MAX_WHOLE_FILE_BYTES = 64 * 1024
+# Lines sent of a large file the index has no definitions for
+HEAD_LINES = 40
+# Bytes scanned at a time when skipping lines of a memory-mapped file
+_CHUNK_BYTES = 1 << 20
+
+_IDENTIFIER_RE = re.compile(r'[A-Za-z_]\w*')
+
+
+def merge_spans(spans: Iterable[Tuple[int, int]], context: int = 0) -> List[Tuple[int, int]]:
+    """Widen (first, last) line spans by `context` lines and merge the ones that touch."""
+    merged: List[Tuple[int, int]] = []
+    for first, last in sorted((max(1, first - context), last + context) for first, last in spans):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def _skip_lines(mm: mmap.mmap, offset: int, count: int) -> Tuple[int, int]:
+    """
+    Move `offset` past `count` newlines, a chunk at a time.
+
+    Returns the new offset and how many newlines could not be skipped
+    because the file ended first.
+    """
+    size = len(mm)
+    while count and offset < size:
+        chunk = mm[offset:offset + _CHUNK_BYTES]
+        newlines = chunk.count(b'\n')
+        if newlines < count:
+            count -= newlines
+            offset += len(chunk)
+            continue
+        position = -1
+        for _ in range(count):
+            position = chunk.find(b'\n', position + 1)
+        return offset + position + 1, 0
+    return offset, count
+
+
+def read_line_ranges(file_path: str, ranges: List[Tuple[int, int]]) -> Tuple[List[Tuple[int, int, str]], bool]:
+    """
+    Read sorted, non-overlapping (first, last) line ranges of a file through
+    a memory map, so only the pages holding those lines and the newlines
+    before them are ever touched.
+
+    Returns (first, last, text) of each range that exists, and whether the
+    file continues past the last one.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return [], False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            results = []
+            line = 1
+            offset = 0
+            for first, last in ranges:
+                offset, missing = _skip_lines(mm, offset, first - line)
+                if missing or offset >= len(mm):
+                    break
+                start = offset
+                offset, missing = _skip_lines(mm, offset, last - first + 1)
+                text = mm[start:offset].decode('utf-8', errors='replace')
+                line = last + 1 - missing
+                if missing and text and not text.endswith('\n'):
+                    # The file's last line has no newline
+                    line += 1
+                results.append((first, line - 1, text if text.endswith('\n') else text + '\n'))
+            return results, offset < len(mm)
+
+
+def render_excerpt(file_path: str, ranges: List[Tuple[int, int]]) -> str:
+    """The given line ranges of a file, with a marker for every run of lines left out."""
+    pieces, more = read_line_ranges(file_path, ranges)
+    parts = ["(excerpt: only the parts relevant to the task, omitted lines are marked)\n"]
+    next_line = 1
+    for first, last, text in pieces:
+        if first > next_line:
+            parts.append(f"... lines {next_line}-{first - 1} omitted ...\n")
+        parts.append(text)
+        next_line = last + 1
+    if more:
+        parts.append(f"... lines {next_line}- omitted ...\n")
+    return "".join(parts)
+
+
+def relevant_spans(definitions: List[Tuple[str, str, Optional[int], Optional[int]]],
+                   names: Set[str]) -> List[Tuple[int, int]]:
+    """Line spans of the definitions, from RepoIndex.definitions_for(), whose name is in `names`."""
+    return [(first, last) for name, _, first, last in definitions if name in names and first is not None]
+
+
+def read_snippets(parent_dir: str, file_paths: List[str], text: str,
+                  context: int = SNIPPET_CONTEXT_LINES, index: Optional[RepoIndex] = None) -> Dict[str, str]:
+    """
+    Read files for a task, keeping only what the task is about.
+
+    A file that defines something named in `text` is cut down to those
+    definitions plus `context` lines around each, using the line spans
+    recorded in the index. Other files are sent whole when small and as an
+    outline of their definitions when not, so large files are never read in
+    full.
+
+    Returns:
+        {path: text to send} in the same layout as read_files_from_paths()
+    """
+    parent_path = Path(parent_dir).resolve()
+    names = set(_IDENTIFIER_RE.findall(text))
+    own_index = index is None
+    if own_index:
+        index = RepoIndex.for_repository(str(parent_path))
+
+    file_contents: Dict[str, str] = {}
+    try:
+        for path in file_paths:
+            normalized_path = str(Path(path))
+            full_path = parent_path / normalized_path
+            try:
+                size = full_path.stat().st_size
+                definitions = index.definitions_for(Path(path).as_posix())
+                spans = relevant_spans(definitions, names)
+                if spans:
+                    content = render_excerpt(str(full_path), merge_spans(spans, context))
+                elif size <= MAX_WHOLE_FILE_BYTES:
+                    content = read_text(str(full_path))
+                else:
+                    headers = [(first, first) for _, _, first, _ in definitions if first is not None]
+                    content = render_excerpt(str(full_path), merge_spans(headers) or [(1, HEAD_LINES)])
+            except FileNotFoundError:
+                print(f"WARNING: File not found: {full_path}")
+                continue
+            except Exception as e:
+                print(f"ERROR reading file {full_path}: {str(e)}")
+                continue
+            file_contents[normalized_path] = content
+            print(f"File: {normalized_path} ({len(content)} of {size} bytes)")
+    finally:
+        if own_index:
+            index.close()
+
+    return file_contents
@@ -0,0 +1,177 @@
+import re
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from tools.memory.index_store import RepoIndex
+
+IDENTIFIER_RE = re.compile(r'\w+')
+# Boundaries inside an identifier: snake_case, camelCase, HTTPServer, v2
+_PART_RE = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+
+# Weight of a query term matching each field; a prefix match counts half
+NAME_WEIGHT = 8.0
+NAME_PART_WEIGHT = 3.0
+PATH_WEIGHT = 1.5
+CODE_WEIGHT = 0.5
+# How far the PageRank of a symbol can lift its text score
+PAGERANK_WEIGHT = 1.0
+
+
+class SearchResult(NamedTuple):
+    path: str
+    position: int
+    code: str
+    name: str
+    score: float
+
+
+def split_identifier(identifier: str) -> List[str]:
+    """
+    Split an identifier into lowercase words at snake_case and camelCase
+    boundaries, e.g. 'parseHTTPResponse_v2' -> ['parse', 'http', 'response', 'v', '2'].
+    """
+    return [part.lower() for part in _PART_RE.findall(identifier)]
+
+
+class SymbolSearch:
+    """
+    In-memory inverted index over symbol names, definition lines and file paths.
+
+    Every field is broken into lowercase words (whole identifiers plus their
+    snake_case/camelCase parts) that map to the symbols containing them. A
+    query is split the same way; each word is looked up exactly and, through
+    a sorted vocabulary, as a prefix, so a lookup costs a few dict probes and
+    one binary search per word regardless of repository size.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, int, str, str]], scores: Optional[Dict[Tuple[str, int], float]] = None):
+        """
+        Args:
+            entries: (path, position, symbol line, symbol name) of every definition
+            scores: PageRank score per (path, position), blended into the ranking
+        """
+        self.entries: List[Tuple[str, int, str, str]] = []
+        self.by_name: Dict[str, List[int]] = {}
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.ranks: List[float] = []
+
+        scores = scores or {}
+        for entry_id, (path, position, code, name) in enumerate(entries):
+            self.entries.append((path, position, code, name))
+            self.by_name.setdefault(name, []).append(entry_id)
+            self.ranks.append(scores.get((path, position), 0.0))
+
+            fields = [
+                ([name.lower()], NAME_WEIGHT),
+                (split_identifier(name), NAME_PART_WEIGHT),
+                (self._path_words(path), PATH_WEIGHT),
+                (self._code_words(code), CODE_WEIGHT),
+            ]
+            for words, weight in fields:
+                for word in words:
+                    postings = self.postings.setdefault(word, {})
+                    # A word found in several fields counts once, at its best weight
+                    if postings.get(entry_id, 0.0) < weight:
+                        postings[entry_id] = weight
+
+        self.vocabulary = sorted(self.postings)
+        top_rank = max(self.ranks, default=0.0)
+        self.rank_scale = PAGERANK_WEIGHT / top_rank if top_rank > 0 else 0.0
+
+    @staticmethod
+    def _path_words(path: str) -> List[str]:
+        words = []
+        for part in Path(path).parts:
+            stem = Path(part).stem
+            words.append(stem.lower())
+            words.extend(split_identifier(stem))
+        return words
+
+    @staticmethod
+    def _code_words(code: str) -> List[str]:
+        words = []
+        for token in IDENTIFIER_RE.findall(code):
+            words.append(token.lower())
+            words.extend(split_identifier(token))
+        return words
+
+    @classmethod
+    def from_generator(cls, generator) -> 'SymbolSearch':
+        """Build from a CodeDependencyGraphGenerator after generate_graph()."""
+        entries = []
+        scores = {}
+        for file_path, position, symbol, symbol_name, node_id in generator.symbol_entries:
+            entries.append((file_path, position, symbol, symbol_name))
+            scores[(file_path, position)] = generator.pagerank_scores.get(node_id, 0.0)
+        return cls(entries, scores)
+
+    @classmethod
+    def from_index(cls, index: RepoIndex) -> 'SymbolSearch':
+        """Build from the symbols and PageRank scores stored in the repository index."""
+        entries = index.conn.execute('SELECT path, position, code, name FROM symbols ORDER BY path, position').fetchall()
+        # Scores are stored under '<path>:<symbol name>' node labels
+        node_scores = {
+            (path, node[len(path) + 1:]): score
+            for node, path, score in index.conn.execute('SELECT node, path, score FROM scores')
+            if path is not None
+        }
+        scores = {(path, position): node_scores.get((path, name), 0.0) for path, position, _, name in entries}
+        return cls(entries, scores)
+
+    def _matches(self, word: str) -> Dict[int, float]:
+        """Postings for a query word: exact matches at full weight, prefixes at half."""
+        matches = dict(self.postings.get(word, {}))
+        start = bisect_left(self.vocabulary, word)
+        for vocab_word in self.vocabulary[start:]:
+            if not vocab_word.startswith(word):
+                break
+            if vocab_word == word:
+                continue
+            for entry_id, weight in self.postings[vocab_word].items():
+                if matches.get(entry_id, 0.0) < weight / 2:
+                    matches[entry_id] = weight / 2
+        return matches
+
+    def search(self, query: str, limit: int = 10) -> List[SearchResult]:
+        """
+        Find the definitions best matching a query, e.g. 'getUser', 'user repo' or 'pars'.
+
+        Each query word contributes its best field weight per symbol; symbols
+        matching more of the words rank higher, and the total is scaled up by
+        the symbol's PageRank relative to the top-ranked symbol.
+        """
+        words = []
+        for token in IDENTIFIER_RE.findall(query):
+            words.append(token.lower())
+            words.extend(part for part in split_identifier(token) if part != token.lower())
+
+        totals: Dict[int, float] = {}
+        for word in dict.fromkeys(words):
+            for entry_id, weight in self._matches(word).items():
+                totals[entry_id] = totals.get(entry_id, 0.0) + weight
+
+        ranked = sorted(
+            ((score * (1.0 + self.ranks[entry_id] * self.rank_scale), entry_id) for entry_id, score in totals.items()),
+            key=lambda item: (-item[0], item[1]))
+        return [SearchResult(*self.entries[entry_id], score) for score, entry_id in ranked[:limit]]
+
+    def definitions(self, name: str) -> List[SearchResult]:
+        """Every definition of exactly this name, highest PageRank first."""
+        entry_ids = sorted(self.by_name.get(name, []), key=lambda entry_id: -self.ranks[entry_id])
+        return [SearchResult(*self.entries[entry_id], self.ranks[entry_id]) for entry_id in entry_ids]
+
+    def resolve_identifiers(self, text: str, min_length: int = 3, limit: int = 3) -> Dict[str, List[SearchResult]]:
+        """
+        Map identifiers mentioned in free text to their definitions.
+
+        Only exact, case-sensitive symbol names are resolved, so ordinary
+        words in a prompt rarely match; `limit` caps the definitions kept for
+        names defined in many places.
+        """
+        resolved = {}
+        for token in dict.fromkeys(IDENTIFIER_RE.findall(text)):
+            if len(token) < min_length or token not in self.by_name:
+                continue
+            resolved[token] = self.definitions(token)[:limit]
+        return resolved
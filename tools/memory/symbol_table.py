@@ -0,0 +1,67 @@
+from typing import Dict, List, Optional, Tuple
+
+
+class SymbolTable:
+    """
+    Interns repository paths, symbol names and the (path, name) pairs that
+    identify graph nodes as dense integer IDs.
+
+    A node is a symbol name within one file, keyed by the file's full
+    relative path, so files sharing a name such as `__init__.py` or
+    `index.js` keep separate nodes. IDs are list positions, so the reverse
+    lookup from a node to its path and name is a list index. IDs are never
+    reused or removed, which lets copies of a graph generator share a table.
+    """
+
+    def __init__(self):
+        self.paths: List[str] = []
+        self.path_ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.name_ids: Dict[str, int] = {}
+        self.node_keys: List[Tuple[int, int]] = []
+        self.node_ids: Dict[Tuple[int, int], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.node_keys)
+
+    def intern_path(self, path: str) -> int:
+        path_id = self.path_ids.get(path)
+        if path_id is None:
+            path_id = self.path_ids[path] = len(self.paths)
+            self.paths.append(path)
+        return path_id
+
+    def intern_name(self, name: str) -> int:
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def node(self, path: str, name: str) -> int:
+        """ID of the node for `name` defined in `path`, interning it if new."""
+        key = (self.intern_path(path), self.intern_name(name))
+        node_id = self.node_ids.get(key)
+        if node_id is None:
+            node_id = self.node_ids[key] = len(self.node_keys)
+            self.node_keys.append(key)
+        return node_id
+
+    def find_node(self, path: str, name: str) -> Optional[int]:
+        """ID of an already interned node, or None."""
+        path_id = self.path_ids.get(path)
+        name_id = self.name_ids.get(name)
+        if path_id is None or name_id is None:
+            return None
+        return self.node_ids.get((path_id, name_id))
+
+    def node_path(self, node_id: int) -> str:
+        return self.paths[self.node_keys[node_id][0]]
+
+    def node_name(self, node_id: int) -> str:
+        return self.names[self.node_keys[node_id][1]]
+
+    def label(self, node_id: int) -> str:
+        """Readable '<path>:<name>' form of a node, for output and storage."""
+        path_id, name_id = self.node_keys[node_id]
+        return f"{self.paths[path_id]}:{self.names[name_id]}"
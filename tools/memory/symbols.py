@@ -0,0 +1,34 @@
+import re
+from typing import Tuple
+
+SYMBOL_NAME_PATTERNS = [
+    (re.compile(pattern), symbol_type) for pattern, symbol_type in [
+        (r'class\s+(\w+)', 'class'),
+        (r'function\s+(\w+)', 'method'),
+        (r'def\s+(\w+)', 'method'),
+        (r'(\w+)\s*\([^)]*\)\s*{', 'method'),
+        (r'(\w+)\s*=\s*(?:async\s+)?\([^)]*\)\s*=>', 'method'),
+        (r'type\s+(\w+)', 'class'),
+        (r'interface\s+(\w+)', 'class'),
+        (r'struct\s+(\w+)', 'class'),
+    ]
+]
+
+
+def extract_symbol_name(code_line: str) -> Tuple[str, str]:
+    """
+    Extract the name and type ('class' or 'method') of the symbol defined
+    on a repo map line. Shared by the dependency graph and the on-disk index
+    so both name symbols the same way.
+    """
+    for pattern, symbol_type in SYMBOL_NAME_PATTERNS:
+        match = pattern.search(code_line)
+        if match:
+            name = match.group(1)
+            if 'constructor' in code_line:
+                name = 'constructor'
+            elif 'async' in code_line:
+                name = name.split()[-1]
+            return name, symbol_type
+
+    return code_line.split('(')[0].strip(), 'method'
@@ -0,0 +1,235 @@
+import os
+import re
+from typing import Iterable, List, Optional, Set, Tuple
+
+# Directories never descended into, whatever the ignore files say
+DEFAULT_EXCLUDE_DIRS = {'node_modules', '.git', '__pycache__', '.lagrange'}
+# Common junk files
+JUNK_FILES = {'.DS_Store', 'Thumbs.db'}
+# Ignore files read from every directory, in increasing precedence
+IGNORE_FILES = ('.gitignore', '.ignore')
+
+
+class FileEntry:
+    """A file found during traversal, with its stat result fetched on demand."""
+
+    __slots__ = ('path', 'rel_path', '_dir_entry')
+
+    def __init__(self, path: str, rel_path: str, dir_entry: os.DirEntry):
+        self.path = path
+        self.rel_path = rel_path
+        self._dir_entry = dir_entry
+
+    def stat(self) -> os.stat_result:
+        # DirEntry caches the result, so repeated calls cost nothing
+        return self._dir_entry.stat()
+
+    def __repr__(self) -> str:
+        return f"FileEntry({self.rel_path!r})"
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate a gitignore glob (without leading '/' or trailing '/') to a regex."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+            out.append('/.*')
+            i += 3
+        elif pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif c == '*':
+            out.append('[^/]*')
+            i += 1
+        elif c == '?':
+            out.append('[^/]')
+            i += 1
+        elif c == '[':
+            end = pattern.find(']', i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                out.append(f'[{body}]')
+                i = end + 1
+        elif c == '\\' and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return ''.join(out)
+
+
+class IgnoreRules:
+    """
+    Patterns from .gitignore-style files, scoped to the directory they were
+    found in. Later rules take precedence, and '!' re-includes a path.
+    """
+
+    def __init__(self, rules: Optional[List[Tuple[str, re.Pattern, bool, bool]]] = None):
+        self.rules = rules or []
+
+    def extended(self, base: str, lines: Iterable[str]) -> 'IgnoreRules':
+        """
+        Return a copy with rules parsed from an ignore file added.
+
+        Args:
+            base: Directory of the ignore file relative to the root, '' for the root
+            lines: Lines of the ignore file
+        """
+        rules = list(self.rules)
+        prefix = f"{base}/" if base else ''
+        for line in lines:
+            line = line.rstrip('\n').rstrip('\r')
+            if not line.endswith('\\ '):
+                line = line.rstrip(' ')
+            if not line or line.startswith('#'):
+                continue
+
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            elif line.startswith('\\'):
+                line = line[1:]
+
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+
+            # A slash anywhere but the end anchors the pattern to `base`
+            if '/' in line:
+                regex = _glob_to_regex(line.lstrip('/'))
+            else:
+                regex = '(?:.*/)?' + _glob_to_regex(line)
+            rules.append((prefix, re.compile(regex), negate, dir_only))
+        return IgnoreRules(rules)
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        ignored = False
+        for prefix, regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if prefix and not rel_path.startswith(prefix):
+                continue
+            if regex.fullmatch(rel_path[len(prefix):]):
+                ignored = not negate
+        return ignored
+
+
+def _read_ignore_files(directory: str, names: Set[str]) -> List[str]:
+    lines = []
+    for ignore_file in IGNORE_FILES:
+        if ignore_file not in names:
+            continue
+        try:
+            with open(os.path.join(directory, ignore_file), 'r', encoding='utf-8', errors='replace') as f:
+                lines.extend(f.readlines())
+        except OSError:
+            pass
+    return lines
+
+
+def walk_repository(path: str, exclude_dirs: Optional[Set[str]] = None,
+                    use_ignore_files: bool = True, follow_symlinks: bool = False) -> List[FileEntry]:
+    """
+    Walk a repository once with os.scandir and return every file worth listing.
+
+    Excluded directories (and any folder containing 'venv') are pruned
+    before descending, .gitignore/.ignore files are honored at every level
+    along with .git/info/exclude, and symlinked directories are only
+    followed when asked to, with already visited directories skipped so
+    symlink loops terminate.
+
+    Args:
+        path (str): Root of the repository
+        exclude_dirs (set, optional): Directory names to prune, defaults to DEFAULT_EXCLUDE_DIRS
+        use_ignore_files (bool): Honor .gitignore and .ignore files
+        follow_symlinks (bool): Descend into symlinked directories
+
+    Returns:
+        List[FileEntry]: Files sorted by relative path, using forward slashes
+    """
+    root = os.path.abspath(path)
+    exclude_dirs = DEFAULT_EXCLUDE_DIRS if exclude_dirs is None else exclude_dirs
+
+    rules = IgnoreRules()
+    if use_ignore_files:
+        try:
+            with open(os.path.join(root, '.git', 'info', 'exclude'), 'r', encoding='utf-8', errors='replace') as f:
+                rules = rules.extended('', f.readlines())
+        except OSError:
+            pass
+
+    # Without following symlinks the tree cannot loop, so only then are
+    # directories tracked by (device, inode)
+    visited = set()
+    if follow_symlinks:
+        try:
+            root_stat = os.stat(root)
+        except OSError:
+            return []
+        visited.add((root_stat.st_dev, root_stat.st_ino))
+
+    collected = []
+    stack = [(root, '', rules)]
+    while stack:
+        directory, rel_dir, rules = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            continue
+
+        if use_ignore_files:
+            lines = _read_ignore_files(directory, {entry.name for entry in entries})
+            if lines:
+                rules = rules.extended(rel_dir, lines)
+
+        for entry in entries:
+            name = entry.name
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+            except OSError:
+                continue
+
+            if is_dir:
+                if name in exclude_dirs or 'venv' in name:
+                    continue
+                if rules.rules and rules.is_ignored(rel_path, True):
+                    continue
+                if follow_symlinks:
+                    try:
+                        dir_stat = entry.stat()
+                    except OSError:
+                        continue
+                    key = (dir_stat.st_dev, dir_stat.st_ino)
+                    if key in visited:
+                        continue
+                    visited.add(key)
+                stack.append((entry.path, rel_path, rules))
+                continue
+
+            if name in JUNK_FILES:
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if rules.rules and rules.is_ignored(rel_path, False):
+                continue
+            collected.append(FileEntry(entry.path, rel_path, entry))
+
+    collected.sort(key=lambda file_entry: file_entry.rel_path)
+    return collected
@@ -0,0 +1,314 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from tools.memory.index_store import INDEX_FILE
+from tools.memory.page_rank import CodeDependencyGraphGenerator
+from tools.memory.repoMap import FileMap, refresh_repository
+from tools.memory.symbol_search import SymbolSearch
+from tools.memory.traversal import DEFAULT_EXCLUDE_DIRS, FileEntry, walk_repository
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class RepoSnapshot(NamedTuple):
+    """Everything the interactive loop reads about the repository, swapped as a unit."""
+    version: int
+    repo_map: Dict[str, FileMap]
+    files: List[str]
+    generator: CodeDependencyGraphGenerator
+    search: SymbolSearch
+
+
+def build_snapshot(repo_path: str, version: int = 0, entries: Optional[List[FileEntry]] = None,
+                   repo_map: Optional[Dict[str, FileMap]] = None) -> RepoSnapshot:
+    """
+    Build a snapshot from the repository index without printing anything.
+
+    Args:
+        repo_path: Root of the repository
+        version: Snapshot counter, increased by the watcher on every rebuild
+        entries: Files from an earlier walk_repository() call
+        repo_map: An up-to-date map; when missing the map is refreshed first
+    """
+    if entries is None:
+        entries = walk_repository(repo_path)
+    if repo_map is None:
+        # A single process: forking from a background thread is not safe
+        repo_map, _ = refresh_repository(repo_path, workers=1, entries=entries)
+
+    generator = CodeDependencyGraphGenerator()
+    generator.generate_graph(os.path.join(repo_path, '.lagrange', INDEX_FILE), scan_references=True,
+                             repo_path=repo_path, verbose=False)
+    return RepoSnapshot(version, repo_map, [entry.rel_path for entry in entries],
+                        generator, SymbolSearch.from_generator(generator))
+
+
+def _is_excluded_dir(name: str) -> bool:
+    return name in DEFAULT_EXCLUDE_DIRS or 'venv' in name
+
+
+class _Inotify:
+    """Recursive inotify watch over a directory tree, through ctypes."""
+
+    def __init__(self, root: str):
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is only available on Linux')
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watches: Dict[int, str] = {}
+        try:
+            self.add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def add_tree(self, path: str) -> None:
+        """Watch a directory and every non-excluded directory below it."""
+        stack = [path]
+        while stack:
+            directory = stack.pop()
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                # The directory may have vanished in the meantime; running out
+                # of watches means the tree cannot be covered at all
+                if error == 28:  # ENOSPC
+                    raise OSError(error, 'inotify watch limit reached')
+                continue
+            self.watches[wd] = directory
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False) and not _is_excluded_dir(entry.name):
+                            stack.append(entry.path)
+            except OSError:
+                continue
+
+    def read(self, timeout: float) -> Tuple[Set[str], bool]:
+        """
+        Wait up to `timeout` seconds for events.
+
+        Returns:
+            The changed paths, and whether the kernel queue overflowed (in
+            which case events were lost and everything must be rechecked)
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set(), False
+
+        changed = set()
+        overflow = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                directory = self.watches.get(wd)
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                if directory is None:
+                    continue
+
+                path = os.path.join(directory, name) if name else directory
+                if mask & IN_ISDIR:
+                    if _is_excluded_dir(name):
+                        continue
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self.add_tree(path)
+                changed.add(path)
+        return changed, overflow
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class RepoWatcher:
+    """
+    Keep the repository map, dependency graph and symbol search up to date
+    from a background thread.
+
+    File changes are picked up through inotify where available and by
+    polling file stats otherwise. Events are batched until the tree has been
+    quiet for `debounce` seconds, then the map is refreshed (only changed
+    files are re-parsed, through the manifest), a copy of the graph is
+    patched for the changed files and the new snapshot is swapped in with a
+    single assignment, so readers of `snapshot` never wait and never see a
+    half-built state.
+    """
+
+    def __init__(self, repo_path: str, snapshot: Optional[RepoSnapshot] = None, debounce: float = 0.3,
+                 poll_interval: float = 1.0, use_inotify: bool = True,
+                 on_update: Optional[Callable[[RepoSnapshot], None]] = None):
+        """
+        Args:
+            repo_path: Root of the repository to watch
+            snapshot: The current state, built on start() when not given
+            debounce: Quiet period before a batch of changes is processed
+            poll_interval: Seconds between stat scans when polling
+            use_inotify: Try inotify before falling back to polling
+            on_update: Called from the watcher thread with every new snapshot
+        """
+        self.repo_path = os.path.abspath(repo_path)
+        self.snapshot = snapshot
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.on_update = on_update
+        self.backend = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._signatures: Dict[str, Tuple[int, int]] = {}
+
+    def start(self) -> 'RepoWatcher':
+        if self._thread is not None:
+            return self
+        if self.snapshot is None:
+            self.snapshot = build_snapshot(self.repo_path)
+
+        inotify = None
+        if self.use_inotify:
+            try:
+                inotify = _Inotify(self.repo_path)
+            except (OSError, AttributeError):
+                inotify = None
+        self.backend = 'inotify' if inotify else 'polling'
+        if inotify is None:
+            self._signatures = self._scan_signatures(walk_repository(self.repo_path))
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(inotify,), name='repo-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self) -> 'RepoWatcher':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _run(self, inotify: Optional[_Inotify]) -> None:
+        try:
+            if inotify is not None:
+                self._watch_inotify(inotify)
+            else:
+                self._watch_polling()
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def _relevant(self, path: str) -> bool:
+        rel_parts = os.path.relpath(path, self.repo_path).split(os.sep)
+        return not any(_is_excluded_dir(part) for part in rel_parts)
+
+    def _watch_inotify(self, inotify: _Inotify) -> None:
+        pending: Set[str] = set()
+        last_event = 0.0
+        while not self._stop.is_set():
+            timeout = self.debounce if pending else 0.5
+            changed, overflow = inotify.read(timeout)
+            changed = {path for path in changed if self._relevant(path)}
+            if changed or overflow:
+                pending.update(changed or {self.repo_path})
+                last_event = time.monotonic()
+                continue
+            if pending and time.monotonic() - last_event >= self.debounce:
+                self._rebuild(sorted(pending))
+                pending.clear()
+
+    def _watch_polling(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            entries = walk_repository(self.repo_path)
+            signatures = self._scan_signatures(entries)
+            if signatures == self._signatures:
+                continue
+            changed = sorted(
+                path for path in signatures.keys() | self._signatures.keys()
+                if signatures.get(path) != self._signatures.get(path))
+            self._signatures = signatures
+            self._rebuild(changed, entries)
+
+    @staticmethod
+    def _scan_signatures(entries: List[FileEntry]) -> Dict[str, Tuple[int, int]]:
+        signatures = {}
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            signatures[entry.rel_path] = (stat.st_size, stat.st_mtime_ns)
+        return signatures
+
+    def _rebuild(self, changed: List[str], entries: Optional[List[FileEntry]] = None) -> None:
+        """Refresh the map and swap in a new snapshot; errors keep the old one."""
+        previous = self.snapshot
+        try:
+            if entries is None:
+                entries = walk_repository(self.repo_path)
+            # A single process: forking from a background thread is not safe
+            repo_map, remapped = refresh_repository(self.repo_path, workers=1, entries=entries)
+            files = [entry.rel_path for entry in entries]
+            if previous and not remapped and files == previous.files:
+                return
+            version = (previous.version + 1) if previous else 0
+            if previous and not remapped:
+                snapshot = previous._replace(version=version, files=files)
+            elif previous and previous.generator.map_path:
+                # Patch a copy of the graph; the current snapshot stays untouched
+                generator = previous.generator.copy()
+                existing = set(files)
+                generator.update([path for path in remapped if path in existing],
+                                 [path for path in remapped if path not in existing])
+                snapshot = RepoSnapshot(version, repo_map, files, generator, SymbolSearch.from_generator(generator))
+            else:
+                snapshot = build_snapshot(self.repo_path, version, entries, repo_map)
+        except Exception as e:
+            print(f"Warning: Could not refresh the repo map after changes to {len(changed)} paths: {e}")
+            return
+        self.snapshot = snapshot
+        if self.on_update:
+            self.on_update(snapshot)